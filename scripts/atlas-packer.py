@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Pack sprites into power-of-two texture atlas pages with Phaser atlas JSON.
+
+Generalizes build-spritesheet.py's fixed 3x4 grid: any mix of props,
+cosmetics and character frames is trimmed to its opaque bounding box,
+bin-packed (MaxRects, best short side fit) into as few pages as possible,
+and each page is shrunk to the smallest power-of-two size that still holds
+its sprites. Sprites whose trimmed pixels are identical share one packed
+rectangle. The JSON is TexturePacker's multiatlas format, with trim offsets
+(spriteSourceSize/sourceSize), so Phaser draws trimmed frames in their
+original position.
+
+Usage:
+    # Everything in the lobby theme -> public/assets/atlases/lobby.json + lobby-N.png
+    python scripts/atlas-packer.py public/assets/themes/default/lobby --out public/assets/atlases/lobby
+
+    # Several sources, 1024px pages, keep transparent borders
+    python scripts/atlas-packer.py props/ public/assets/cosmetics/hats/*.png \\
+        --out public/assets/atlases/props --max-size 1024 --no-trim
+
+Load in Phaser with:
+    this.load.multiatlas('lobby', '/assets/atlases/lobby.json', '/assets/atlases');
+    this.add.image(x, y, 'lobby', 'prop-bench');
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+from PIL import Image
+
+DEFAULT_MAX_SIZE = 2048
+DEFAULT_PADDING = 2
+MIN_PAGE_SIZE = 32
+
+IMAGE_SUFFIXES = {".png", ".webp"}
+
+
+class MaxRectsBin:
+    """MaxRects bin packer: best short side fit, no rotation.
+
+    Keeps the list of maximal free rectangles; each placement splits every
+    free rectangle it overlaps and drops the ones contained in another.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.free = [(0, 0, width, height)]
+
+    def insert(self, width: int, height: int):
+        """Place a width x height rectangle, returning its (x, y) or None if it doesn't fit."""
+        best = None
+        best_fit = None
+        for fx, fy, fw, fh in self.free:
+            if width <= fw and height <= fh:
+                leftover_w, leftover_h = fw - width, fh - height
+                fit = (min(leftover_w, leftover_h), max(leftover_w, leftover_h))
+                if best_fit is None or fit < best_fit:
+                    best, best_fit = (fx, fy), fit
+        if best is None:
+            return None
+        self._split(best[0], best[1], width, height)
+        return best
+
+    def _split(self, x, y, width, height):
+        right, bottom = x + width, y + height
+        free = []
+        for fx, fy, fw, fh in self.free:
+            if x >= fx + fw or right <= fx or y >= fy + fh or bottom <= fy:
+                free.append((fx, fy, fw, fh))
+                continue
+            if x > fx:
+                free.append((fx, fy, x - fx, fh))
+            if right < fx + fw:
+                free.append((right, fy, fx + fw - right, fh))
+            if y > fy:
+                free.append((fx, fy, fw, y - fy))
+            if bottom < fy + fh:
+                free.append((fx, bottom, fw, fy + fh - bottom))
+        self.free = [
+            r for i, r in enumerate(free)
+            if not any(i != j and _contains(o, r) and (o != r or j < i) for j, o in enumerate(free))
+        ]
+
+
+def _contains(outer, inner) -> bool:
+    ox, oy, ow, oh = outer
+    ix, iy, iw, ih = inner
+    return ox <= ix and oy <= iy and ix + iw <= ox + ow and iy + ih <= oy + oh
+
+
+def next_power_of_two(value: int) -> int:
+    return 1 << max(0, value - 1).bit_length()
+
+
+def trim_sprite(img: Image.Image):
+    """Crop to the opaque bounding box, returning (trimmed, (x, y) offset).
+
+    A fully transparent sprite keeps a single transparent pixel so it still
+    gets a frame.
+    """
+    bbox = img.getchannel("A").getbbox()
+    if bbox is None:
+        return img.crop((0, 0, 1, 1)), (0, 0)
+    if bbox == (0, 0, img.width, img.height):
+        return img, (0, 0)
+    return img.crop(bbox), bbox[:2]
+
+
+def _pixel_digest(img: Image.Image) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.width}x{img.height}".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def load_sprites(sources: list, trim: bool = True) -> list:
+    """Load sprites from files and directories (recursively).
+
+    Frame names are paths relative to the given directory, without the
+    extension and with forward slashes ("hats/crown-front"); files given
+    directly are named by their stem.
+    """
+    entries = []
+    for source in sources:
+        source = Path(source)
+        if source.is_dir():
+            for path in sorted(source.rglob("*")):
+                if path.suffix.lower() in IMAGE_SUFFIXES:
+                    entries.append((path.relative_to(source).with_suffix("").as_posix(), path))
+        elif source.exists():
+            entries.append((source.stem, source))
+        else:
+            print(f"Warning: Not found: {source}")
+
+    sprites = []
+    seen = set()
+    for name, path in entries:
+        if name in seen:
+            print(f"Warning: Duplicate frame name '{name}', skipping {path}")
+            continue
+        seen.add(name)
+
+        img = Image.open(path).convert("RGBA")
+        source_size = img.size
+        offset = (0, 0)
+        if trim:
+            img, offset = trim_sprite(img)
+        sprites.append({
+            "name": name,
+            "image": img,
+            "sourceSize": source_size,
+            "offset": offset,
+            "digest": _pixel_digest(img),
+        })
+    return sprites
+
+
+def _try_pack(sizes: list, width: int, height: int, padding: int):
+    """Pack (w, h) sizes into one width x height page; positions or None."""
+    packer = MaxRectsBin(width + padding, height + padding)
+    positions = []
+    for w, h in sizes:
+        pos = packer.insert(w + padding, h + padding)
+        if pos is None:
+            return None
+        positions.append(pos)
+    return positions
+
+
+def _smallest_page(sizes: list, max_size: int, padding: int):
+    """Smallest power-of-two page (by area, then squareness) that fits all sizes."""
+    area = sum((w + padding) * (h + padding) for w, h in sizes)
+    widest = max(w for w, _ in sizes)
+    tallest = max(h for _, h in sizes)
+
+    candidates = []
+    width = max(MIN_PAGE_SIZE, next_power_of_two(widest))
+    while width <= max_size:
+        height = max(MIN_PAGE_SIZE, next_power_of_two(tallest))
+        while height <= max_size:
+            if (width + padding) * (height + padding) >= area:
+                candidates.append((width * height, abs(width - height), width, height))
+            height *= 2
+        width *= 2
+
+    for _, _, width, height in sorted(candidates):
+        positions = _try_pack(sizes, width, height, padding)
+        if positions is not None:
+            return width, height, positions
+    return None
+
+
+def oversized_sprites(sprites: list, max_size: int) -> list:
+    """Sprites whose trimmed size exceeds a max_size page in either dimension."""
+    return [s for s in sprites if s["image"].width > max_size or s["image"].height > max_size]
+
+
+def pack_sprites(sprites: list, max_size: int = DEFAULT_MAX_SIZE, padding: int = DEFAULT_PADDING) -> list:
+    """Pack sprites into pages.
+
+    Returns a list of pages: {"size": (w, h), "placements": [(sprite, x, y)]}.
+    Sprites with identical trimmed pixels share one packed rectangle.
+    Raises ValueError if max_size is below MIN_PAGE_SIZE or a sprite doesn't
+    fit on a max_size page.
+    """
+    if max_size < MIN_PAGE_SIZE:
+        raise ValueError(f"max_size must be at least {MIN_PAGE_SIZE}px, got {max_size}")
+    oversized = oversized_sprites(sprites, max_size)
+    if oversized:
+        raise ValueError(f"{len(oversized)} sprite(s) larger than a {max_size}px page: "
+                         + ", ".join(s["name"] for s in oversized))
+
+    unique = {}
+    for sprite in sprites:
+        unique.setdefault(sprite["digest"], []).append(sprite)
+
+    # Big-first order packs much tighter
+    remaining = sorted(
+        unique.values(),
+        key=lambda g: (max(g[0]["image"].size), g[0]["image"].width * g[0]["image"].height),
+        reverse=True,
+    )
+
+    pages = []
+    while remaining:
+        # Fill one max-size page greedily...
+        packer = MaxRectsBin(max_size + padding, max_size + padding)
+        page_groups, leftover = [], []
+        for group in remaining:
+            w, h = group[0]["image"].size
+            if packer.insert(w + padding, h + padding) is None:
+                leftover.append(group)
+            else:
+                page_groups.append(group)
+
+        # ...then repack those sprites into the smallest power-of-two page
+        sizes = [group[0]["image"].size for group in page_groups]
+        page = _smallest_page(sizes, max_size, padding)
+        if page is None:
+            raise ValueError(f"Could not fit {len(sizes)} sprite(s) on a {max_size}px page")
+        width, height, positions = page
+        placements = [
+            (sprite, x, y)
+            for group, (x, y) in zip(page_groups, positions)
+            for sprite in group
+        ]
+        pages.append({"size": (width, height), "placements": placements})
+        remaining = leftover
+
+    return pages
+
+
+def frame_entry(sprite: dict, x: int, y: int) -> dict:
+    """Phaser/TexturePacker frame record for a placed sprite."""
+    w, h = sprite["image"].size
+    source_w, source_h = sprite["sourceSize"]
+    offset_x, offset_y = sprite["offset"]
+    return {
+        "filename": sprite["name"],
+        "rotated": False,
+        "trimmed": (w, h) != (source_w, source_h),
+        "sourceSize": {"w": source_w, "h": source_h},
+        "spriteSourceSize": {"x": offset_x, "y": offset_y, "w": w, "h": h},
+        "frame": {"x": x, "y": y, "w": w, "h": h},
+    }
+
+
+def write_atlas(pages: list, out: Path) -> dict:
+    """Write page PNGs (<out>-<n>.png) and the multiatlas JSON (<out>.json)."""
+    out.parent.mkdir(parents=True, exist_ok=True)
+    textures = []
+    for index, page in enumerate(pages):
+        image_name = f"{out.name}-{index}.png"
+        sheet = Image.new("RGBA", page["size"], (0, 0, 0, 0))
+        drawn = set()
+        frames = []
+        for sprite, x, y in page["placements"]:
+            if (x, y) not in drawn:
+                sheet.paste(sprite["image"], (x, y))
+                drawn.add((x, y))
+            frames.append(frame_entry(sprite, x, y))
+        sheet.save(out.parent / image_name, optimize=True)
+        textures.append({
+            "image": image_name,
+            "format": "RGBA8888",
+            "size": {"w": page["size"][0], "h": page["size"][1]},
+            "scale": 1,
+            "frames": sorted(frames, key=lambda f: f["filename"]),
+        })
+
+    atlas = {
+        "textures": textures,
+        "meta": {"app": "atlas-packer.py", "version": "1.0"},
+    }
+    json_path = out.with_name(out.name + ".json")
+    json_path.write_text(json.dumps(atlas, indent=2) + "\n")
+    return atlas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack sprites into power-of-two atlas pages (Phaser multiatlas JSON)")
+    parser.add_argument("sources", nargs="+", help="Image files and/or directories to pack")
+    parser.add_argument("--out", required=True, type=Path,
+                        help="Output path without extension (writes <out>.json and <out>-N.png)")
+    parser.add_argument("--max-size", type=int, default=DEFAULT_MAX_SIZE,
+                        help=f"Maximum page width/height, a power of two (default: {DEFAULT_MAX_SIZE})")
+    parser.add_argument("--padding", type=int, default=DEFAULT_PADDING,
+                        help=f"Transparent pixels between sprites (default: {DEFAULT_PADDING})")
+    parser.add_argument("--no-trim", dest="trim", action="store_false",
+                        help="Keep transparent borders instead of trimming them")
+    args = parser.parse_args()
+
+    if args.max_size != next_power_of_two(args.max_size):
+        parser.error("--max-size must be a power of two")
+    if args.max_size < MIN_PAGE_SIZE:
+        parser.error(f"--max-size must be at least {MIN_PAGE_SIZE}")
+
+    sprites = load_sprites(args.sources, trim=args.trim)
+    if not sprites:
+        print("Error: No sprites found.")
+        sys.exit(1)
+
+    oversized = oversized_sprites(sprites, args.max_size)
+    if oversized:
+        print(f"Error: {len(oversized)} sprite(s) don't fit on a {args.max_size}px page "
+              f"(raise --max-size or split them):")
+        for sprite in oversized:
+            print(f"  {sprite['name']}: {sprite['image'].width}x{sprite['image'].height}")
+        sys.exit(1)
+
+    print(f"Packing {len(sprites)} sprites (max page {args.max_size}px, padding {args.padding}px)...")
+    pages = pack_sprites(sprites, args.max_size, args.padding)
+    write_atlas(pages, args.out)
+
+    source_pixels = sum(s["sourceSize"][0] * s["sourceSize"][1] for s in sprites)
+    page_pixels = sum(p["size"][0] * p["size"][1] for p in pages)
+    for index, page in enumerate(pages):
+        width, height = page["size"]
+        rects = {(x, y): sprite["image"].size for sprite, x, y in page["placements"]}
+        used = sum(w * h for w, h in rects.values())
+        print(f"  {args.out.name}-{index}.png: {width}x{height}, "
+              f"{len(page['placements'])} frames, {used / (width * height):.0%} filled")
+    print(f"\n{len(sprites)} images -> {len(pages)} page{'s' if len(pages) != 1 else ''}; "
+          f"{source_pixels / 1e6:.1f} -> {page_pixels / 1e6:.1f} Mpx of texture memory")
+    print(f"Atlas: {args.out.with_name(args.out.name + '.json')}")
+
+
+if __name__ == "__main__":
+    main()
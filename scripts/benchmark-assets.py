@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Benchmark the asset-processing kernels and the end-to-end ingest pipeline.
+
+Runs fully offline: inputs are synthetic Gemini-style images (green or lime
+background, a white clown-ish sprite, and a four-point star in the
+bottom-right corner) generated at each requested size. Each kernel is timed
+(median of --repeat runs) and its peak traced memory recorded in a separate
+run, then compared against a stored baseline JSON.
+
+Timings only mean something on the machine that recorded them, so the
+baseline is machine-local (.cache/asset-pipeline/bench-baseline.json, not
+committed): record one first, on the commit you want to compare against.
+Comparing without a baseline is an error.
+
+Usage:
+    # 1. Record a baseline (e.g. on main)
+    python scripts/benchmark-assets.py --save-baseline
+
+    # 2. Run everything at the default sizes and compare with the baseline
+    python scripts/benchmark-assets.py
+
+    # Only some kernels/sizes
+    python scripts/benchmark-assets.py --kernels green_key,recolor --sizes 256,1024
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+SCRIPTS_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import derivatives
+import image_ops
+import ingest_image
+import remove_watermark
+
+DEFAULT_BASELINE = SCRIPTS_DIR.parent / ".cache/asset-pipeline/bench-baseline.json"
+DEFAULT_SIZES = [256, 512, 1024, 2048, 4096]
+
+# Gemini's usual backgrounds
+BACKGROUNDS = {
+    "green": (0, 255, 0),
+    "lime": (141, 206, 74),
+}
+
+
+def load_script(filename: str, module_name: str):
+    """Import a hyphenated script (e.g. generate-color-variants.py) as a module."""
+    spec = importlib.util.spec_from_file_location(module_name, SCRIPTS_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_gemini_image(size: int, background: str = "lime", seed: int = 0) -> Image.Image:
+    """Synthetic Gemini-style image: keyed background, sprite, corner star.
+
+    The background gets slight noise and the sprite soft edges so the
+    chroma key's edge/defringe paths are exercised, not just flat fills.
+    """
+    rng = np.random.default_rng(seed)
+    data = np.empty((size, size, 3), dtype=np.int16)
+    data[:] = BACKGROUNDS[background]
+    data += rng.integers(-6, 7, size=data.shape, dtype=np.int16)
+    img = Image.fromarray(np.clip(data, 0, 255).astype(np.uint8))
+
+    draw = ImageDraw.Draw(img)
+    s = size / 256
+
+    # Clown-ish sprite: black outline, white body, red nose
+    draw.ellipse((60 * s, 40 * s, 196 * s, 220 * s), fill=(20, 20, 20))
+    draw.ellipse((66 * s, 46 * s, 190 * s, 214 * s), fill=(245, 245, 245))
+    draw.ellipse((118 * s, 110 * s, 138 * s, 130 * s), fill=(220, 30, 30))
+    img = img.filter(ImageFilter.SMOOTH)
+
+    # Gemini star: fixed pixel size, ~56px in from the corner
+    draw = ImageDraw.Draw(img)
+    cx, cy, r, w = size - 56, size - 56, 18, 4
+    draw.polygon([
+        (cx, cy - r), (cx + w, cy - w), (cx + r, cy), (cx + w, cy + w),
+        (cx, cy + r), (cx - w, cy + w), (cx - r, cy), (cx - w, cy - w),
+    ], fill=(235, 240, 225))
+    return img
+
+
+def time_call(fn, repeat: int) -> float:
+    """Median wall time of fn() in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def peak_memory(fn) -> float:
+    """Peak traced allocation (MB) during one call of fn().
+
+    numpy reports its buffers to tracemalloc, so this covers the array
+    temporaries the kernels build.
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+class IngestSandbox:
+    """Points ingest_image at a throwaway directory tree for the pipeline benchmark."""
+
+    def __init__(self):
+        self.root = Path(tempfile.mkdtemp(prefix="asset-bench-"))
+        self._saved = {}
+
+    def __enter__(self):
+        config = ingest_image.ASSET_TYPES["theme"]
+        self._saved = {
+            "THEMES_DIR": ingest_image.THEMES_DIR,
+            "STAGE_CACHE_DIR": ingest_image.STAGE_CACHE_DIR,
+            "WATERMARK_POSITIONS_FILE": remove_watermark.WATERMARK_POSITIONS_FILE,
+            "config": dict(config),
+        }
+        ingest_image.THEMES_DIR = self.root
+        ingest_image.STAGE_CACHE_DIR = self.root / ".stages"
+        remove_watermark.WATERMARK_POSITIONS_FILE = self.root / "watermark-positions.json"
+        remove_watermark._watermark_positions = None
+        config.update(
+            originals_base=self.root / "_originals",
+            processed_base=self.root / "_processed",
+            final_base=self.root,
+        )
+        return self
+
+    def __exit__(self, *exc):
+        ingest_image.THEMES_DIR = self._saved["THEMES_DIR"]
+        ingest_image.STAGE_CACHE_DIR = self._saved["STAGE_CACHE_DIR"]
+        remove_watermark.WATERMARK_POSITIONS_FILE = self._saved["WATERMARK_POSITIONS_FILE"]
+        remove_watermark._watermark_positions = None
+        ingest_image.ASSET_TYPES["theme"].update(self._saved["config"])
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def build_kernels(color_variants) -> dict:
+    """name -> setup(img, input_path) returning the zero-arg callable to time."""
+    kernels = {}
+
+    kernels["green_key"] = lambda img, path: (lambda: image_ops.remove_green_background(img))
+    kernels["green_key_reference"] = (
+        lambda img, path: (lambda: image_ops.remove_green_background_reference(img)))
+
+    kernels["green_key_full_frame"] = (
+        lambda img, path: (lambda: image_ops.remove_green_background(img, band_height=None)))
+
+    def recolor(img, path):
+        keyed = image_ops.remove_green_background(img)
+        return lambda: image_ops.replace_white_with_color(keyed, (100, 149, 237))
+    kernels["recolor"] = recolor
+
+    def recolor_all(img, path):
+        keyed = image_ops.remove_green_background(img)
+
+        def render_all():
+            engine = image_ops.RecolorEngine(keyed)
+            for color in color_variants.COLOR_VARIANTS.values():
+                engine.render(color)
+        return render_all
+    kernels["recolor_all_variants"] = recolor_all
+
+    def recolor_reference(img, path):
+        keyed = image_ops.remove_green_background(img)
+        return lambda: image_ops.replace_white_with_color_reference(keyed, (100, 149, 237))
+    kernels["recolor_reference"] = recolor_reference
+
+    if remove_watermark.HAS_OPENCV:
+        import cv2
+
+        def detect(img, path):
+            img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+            return lambda: remove_watermark.detect_gemini_watermark(img_cv)
+        kernels["detect_watermark"] = detect
+
+        def match(img, path):
+            gray = np.asarray(img.crop((img.width - 100, img.height - 100, img.width, img.height)).convert("L"))
+            return lambda: remove_watermark._match_star(gray)
+        kernels["match_watermark"] = match
+
+        # After the first call this is the per-resolution cached path
+        kernels["locate_watermark"] = lambda img, path: (lambda: remove_watermark.locate_watermark(img))
+
+    kernels["remove_watermark"] = lambda img, path: (lambda: ingest_image.remove_watermark(img))
+
+    kernels["pyramid"] = lambda img, path: (lambda: derivatives.build_pyramid(img, derivatives.DEFAULT_WIDTHS))
+
+    def pipeline(img, path):
+        return lambda: ingest_image.process_image(
+            input_path=path,
+            theme="bench",
+            zone="bench",
+            green_bg=True,
+            force=True,
+            use_cache=False,
+        )
+    kernels["process_image"] = pipeline
+
+    return kernels
+
+
+def run(kernel_names, sizes, repeat, background) -> dict:
+    color_variants = load_script("generate-color-variants.py", "generate_color_variants")
+    kernels = build_kernels(color_variants)
+    unknown = [k for k in kernel_names if k not in kernels]
+    if unknown:
+        print(f"Skipping unavailable kernels: {', '.join(unknown)}")
+    kernel_names = [k for k in kernel_names if k in kernels]
+
+    # Build the LUT before timing anything
+    image_ops.get_green_key_lut()
+
+    results = {}
+    with IngestSandbox() as sandbox:
+        for size in sizes:
+            img = make_gemini_image(size, background)
+            path = sandbox.root / f"input-{size}.png"
+            img.save(path, compress_level=1)
+
+            for name in kernel_names:
+                fn = kernels[name](img, path)
+                # Warm-up run keeps one-time loads (models, LUTs) out of the numbers
+                _quiet(fn)
+                ms = _quiet(lambda: time_call(fn, repeat))
+                mb = _quiet(lambda: peak_memory(fn))
+                results[f"{name}@{size}"] = {"ms": round(ms, 3), "peak_mb": round(mb, 2)}
+                print(f"  {name:<22} {size:>5}px  {ms:>10.2f} ms  {mb:>9.1f} MB")
+
+    return results
+
+
+def _quiet(fn):
+    """Call fn with the pipeline's progress prints suppressed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn()
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> int:
+    """Print a comparison against the baseline; return the number of regressions."""
+    print(f"\n{'benchmark':<30} {'baseline':>10} {'now':>10} {'change':>8}   memory")
+    regressions = 0
+    for key, now in results.items():
+        before = baseline.get(key)
+        if not before:
+            print(f"{key:<30} {'-':>10} {now['ms']:>9.2f}ms {'new':>8}")
+            continue
+        change = now["ms"] / before["ms"] - 1 if before["ms"] else 0.0
+        mem_change = now["peak_mb"] / before["peak_mb"] - 1 if before["peak_mb"] else 0.0
+        flag = ""
+        if change > tolerance or mem_change > tolerance:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key:<30} {before['ms']:>8.2f}ms {now['ms']:>8.2f}ms {change:>+7.0%}   "
+              f"{before['peak_mb']:.1f} -> {now['peak_mb']:.1f} MB{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark asset-processing kernels")
+    parser.add_argument("--kernels", default="green_key,green_key_reference,green_key_full_frame,"
+                        "recolor,recolor_reference,recolor_all_variants,detect_watermark,match_watermark,"
+                        "locate_watermark,remove_watermark,pyramid,process_image",
+                        help="Comma-separated kernels to run")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated square image sizes in px")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per kernel (default: 5)")
+    parser.add_argument("--background", choices=list(BACKGROUNDS.keys()), default="lime",
+                        help="Synthetic background color (default: lime)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE,
+                        help="Baseline JSON (default: .cache/asset-pipeline/bench-baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Slowdown/memory growth that counts as a regression (default: 0.15)")
+    args = parser.parse_args()
+
+    # Fail before spending minutes on a run there's nothing to compare with
+    if not args.save_baseline and not args.baseline.exists():
+        print(f"Error: No baseline at {args.baseline}.")
+        print("Record one first with --save-baseline (baselines are per machine).")
+        sys.exit(1)
+
+    kernel_names = [k.strip() for k in args.kernels.split(",") if k.strip()]
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    print(f"Benchmarking {len(kernel_names)} kernels at {sizes} px ({args.repeat} runs each)\n")
+    results = run(kernel_names, sizes, args.repeat, args.background)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nSaved baseline: {args.baseline}")
+        return
+
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    if regressions:
+        print(f"\n{regressions} regression{'s' if regressions != 1 else ''} beyond {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
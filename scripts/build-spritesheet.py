@@ -2,19 +2,39 @@
 Build clown spritesheet from individual frames.
 Removes green background, creates flips, assembles 3x4 grid.
 
-Usage: python build-spritesheet.py
+With --dedupe, writes clown-spritesheet-deduped.png instead: each unique
+frame stored once (no repeated or mirrored copies), plus a JSON file
+mapping every cell of the 3x4 layout to a stored frame and a flipX flag.
+
+Only frames whose source changed are reprocessed, and the sheet is only
+reassembled when a cleaned frame changed (see build_cache.py).
+
+Usage: python build-spritesheet.py [--band-height ROWS] [--dedupe] [--force]
 """
 
+import argparse
+import hashlib
+import json
+import sys
 from pathlib import Path
 from PIL import Image
-import numpy as np
+
+# Shared kernels (LUT-based green key, frame fitting) and the build cache
+sys.path.insert(0, str(Path(__file__).parent))
+from build_cache import BuildCache
+from image_ops import DEFAULT_BAND_HEIGHT, fit_and_center, remove_green_background
 
 CHAR_DIR = Path(__file__).parent.parent / "public/assets/characters"
 OUTPUT_FILE = CHAR_DIR / "clown-spritesheet.png"
+DEDUPED_OUTPUT_FILE = CHAR_DIR / "clown-spritesheet-deduped.png"
+DEDUPED_METADATA_FILE = CHAR_DIR / "clown-spritesheet-deduped.json"
 
 # Frame size - use larger size to preserve quality
 FRAME_SIZE = 256
 
+# Bump when frame processing or sheet assembly changes so cached outputs rebuild
+BUILD_VERSION = 1
+
 # Source files (6 unique frames)
 # Use -processed.png files if available (watermark + green bg already removed)
 # Otherwise fall back to originals (will need green bg removal)
@@ -27,103 +47,147 @@ FRAMES = {
     "back-walk": CHAR_DIR / "clown-back-walk-processed.png",
 }
 
-def remove_green_background(img):
-    """Remove green background and make transparent with clean edges.
-
-    Handles yellow-green backgrounds like (166, 217, 36) from Gemini.
-    """
-    img = img.convert("RGBA")
-    data = np.array(img, dtype=np.float32)
-
-    r, g, b, a = data[:,:,0], data[:,:,1], data[:,:,2], data[:,:,3]
-
-    # Detect green-ish background: green is highest channel, blue is low
-    # This catches both pure green AND yellow-green backgrounds
-    is_green_dominant = (g > r) & (g > b) & (b < 100)
-
-    # Background pixels are bright and green-dominant
-    is_background = is_green_dominant & (g > 150)
-
-    # For edge detection, calculate how "green" each pixel is
-    # Higher ratio = more background-like
-    green_ratio = np.where(g > 0, g / (r + b + 1), 0)
-
-    # Soft edges: pixels that are somewhat green get partial transparency
-    # This handles anti-aliased edges smoothly
-    edge_greenness = np.clip((green_ratio - 0.8) / 0.7, 0, 1)
-
-    # Combine: definite background = 0 alpha, edges = partial alpha
-    alpha_factor = np.where(is_background, 0, 1 - edge_greenness * 0.8)
-
-    # Also catch any pixel where green significantly exceeds other channels
-    strong_green = (g > 180) & (g > r + 30) & (g > b + 100)
-    alpha_factor = np.where(strong_green, 0, alpha_factor)
-
-    # Apply alpha
-    new_alpha = (alpha_factor * 255).astype(np.uint8)
-
-    # For semi-transparent edge pixels, reduce green tint (defringe)
-    edge_mask = (new_alpha > 0) & (new_alpha < 240)
-    if np.any(edge_mask):
-        # Reduce green channel on edges to remove green fringe
-        g_adjusted = np.where(edge_mask, np.minimum(g, (r + b) / 2 * 1.2), g)
-        data[:,:,1] = g_adjusted
-
-    # Rebuild image with new alpha
-    result = np.stack([
-        data[:,:,0].astype(np.uint8),
-        data[:,:,1].astype(np.uint8),
-        data[:,:,2].astype(np.uint8),
-        new_alpha
-    ], axis=2)
-
-    return Image.fromarray(result)
-
-def resize_frame(img, size=FRAME_SIZE):
-    """Resize image to target frame size, maintaining aspect ratio and centering."""
-    img.thumbnail((size, size), Image.Resampling.LANCZOS)
-
-    # Create new image with padding
-    new_img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
-
-    # Center the resized image
-    x = (size - img.width) // 2
-    y = (size - img.height) // 2
-    new_img.paste(img, (x, y), img)
-
-    return new_img
+# 3x4 spritesheet layout (768x1024):
+# Row 1 (FRONT): front-idle | front-walk | front-walk-flip
+# Row 2 (RIGHT): side-idle  | side-walk  | side-idle
+# Row 3 (LEFT):  side-idle-flip | side-walk-flip | side-idle-flip
+# Row 4 (BACK):  back-idle  | back-walk  | back-walk-flip
+LAYOUT = [
+    ["front-idle", "front-walk", "front-walk-flip"],
+    ["side-idle", "side-walk", "side-idle"],
+    ["side-idle-flip", "side-walk-flip", "side-idle-flip"],
+    ["back-idle", "back-walk", "back-walk-flip"],
+]
 
 def flip_horizontal(img):
     """Flip image horizontally."""
     return img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
 
-def build_spritesheet():
+def frame_digest(img):
+    """Hash of a frame's exact pixels."""
+    return hashlib.blake2b(img.tobytes(), digest_size=16).hexdigest()
+
+def dedupe_layout(processed, layout):
+    """Collapse the layout to unique frames.
+
+    Cells whose pixels match a stored frame, or its horizontal mirror, become
+    aliases of it. Returns (unique frame names, {cell name: (index, flip_x)}).
+    """
+    unique = []
+    stored = {}
+    aliases = {}
+    for frame_name in (name for row in layout for name in row):
+        if frame_name in aliases or frame_name not in processed:
+            continue
+        img = processed[frame_name]
+        digest = frame_digest(img)
+        if digest in stored:
+            aliases[frame_name] = (stored[digest], False)
+            continue
+        mirrored = frame_digest(flip_horizontal(img))
+        if mirrored in stored:
+            aliases[frame_name] = (stored[mirrored], True)
+            continue
+        stored[digest] = len(unique)
+        aliases[frame_name] = (len(unique), False)
+        unique.append(frame_name)
+    return unique, aliases
+
+def write_deduped_sheet(processed, cols=3):
+    """Save the unique frames as a grid plus the alias/flip metadata."""
+    unique, aliases = dedupe_layout(processed, LAYOUT)
+    rows = -(-len(unique) // cols)
+    sheet = Image.new("RGBA", (cols * FRAME_SIZE, rows * FRAME_SIZE), (0, 0, 0, 0))
+
+    print("\nAssembling deduplicated spritesheet...")
+    for index, frame_name in enumerate(unique):
+        x = (index % cols) * FRAME_SIZE
+        y = (index // cols) * FRAME_SIZE
+        sheet.paste(processed[frame_name], (x, y), processed[frame_name])
+        print(f"  [{index}] = {frame_name}")
+    for frame_name, (index, flip_x) in aliases.items():
+        if unique[index] != frame_name:
+            print(f"  {frame_name} -> [{index}]{' (flipX)' if flip_x else ''}")
+
+    # layout[i] resolves cell i of clown-spritesheet.png
+    metadata = {
+        "image": DEDUPED_OUTPUT_FILE.name,
+        "frameWidth": FRAME_SIZE,
+        "frameHeight": FRAME_SIZE,
+        "columns": cols,
+        "frames": unique,
+        "aliases": {name: {"frame": index, "flipX": flip_x} for name, (index, flip_x) in aliases.items()},
+        "layout": [
+            {"name": name, "frame": aliases[name][0], "flipX": aliases[name][1]} if name in aliases else None
+            for row in LAYOUT for name in row
+        ],
+    }
+
+    sheet.save(DEDUPED_OUTPUT_FILE)
+    DEDUPED_METADATA_FILE.write_text(json.dumps(metadata, indent=2) + "\n")
+    full_cells = sum(len(row) for row in LAYOUT)
+    saved = 1 - (cols * rows) / full_cells
+    print(f"\nSpritesheet saved: {DEDUPED_OUTPUT_FILE}")
+    print(f"Metadata saved: {DEDUPED_METADATA_FILE}")
+    print(f"Size: {sheet.width}x{sheet.height} ({len(unique)} unique of {full_cells} frames, "
+          f"{saved:.0%} fewer pixels than the full grid)")
+
+def process_frame(path, band_height: int = DEFAULT_BAND_HEIGHT):
+    """Key out the green background (unless already transparent) and fit to a frame."""
+    img = Image.open(path)
+
+    # Skip green bg removal if image already has transparency (pre-processed)
+    if img.mode != "RGBA":
+        img = remove_green_background(img, band_height)
+    else:
+        print(f"  (already has transparency, skipping bg removal)")
+
+    return fit_and_center(img, FRAME_SIZE)
+
+def build_spritesheet(band_height: int = DEFAULT_BAND_HEIGHT, dedupe: bool = False,
+                      cache: BuildCache = None):
+    cache = cache or BuildCache()
     print("Building clown spritesheet...")
 
-    # Load and process all frames
+    # Process frames whose source (or the processing itself) changed
     processed = {}
+    clean_paths = {}
     for name, path in FRAMES.items():
         if not path.exists():
             print(f"Warning: Missing file {path}")
             continue
 
-        print(f"Processing {name}...")
-        img = Image.open(path)
-
-        # Skip green bg removal if image already has transparency (pre-processed)
-        if img.mode != "RGBA":
-            img = remove_green_background(img)
-        else:
-            print(f"  (already has transparency, skipping bg removal)")
+        # Individual cleaned frame, kept for reference and as the build cache
+        clean_path = CHAR_DIR / f"clown-{name}-clean.png"
+        clean_paths[name] = clean_path
+        frame_key = cache.key("frame", BUILD_VERSION, cache.file_hash(path), FRAME_SIZE)
+        if cache.is_fresh(clean_path, frame_key):
+            print(f"Unchanged {name} ({clean_path.name})")
+            continue
 
-        img = resize_frame(img)
+        print(f"Processing {name}...")
+        img = process_frame(path, band_height)
         processed[name] = img
-
-        # Save individual cleaned frame for reference
-        clean_path = CHAR_DIR / f"clown-{name}-clean.png"
         img.save(clean_path)
+        cache.record(clean_path, frame_key)
         print(f"  Saved: {clean_path.name}")
 
+    outputs = [DEDUPED_OUTPUT_FILE, DEDUPED_METADATA_FILE] if dedupe else [OUTPUT_FILE]
+    sheet_key = cache.key(
+        "sheet", BUILD_VERSION, dedupe, FRAME_SIZE, LAYOUT,
+        {name: cache.file_hash(clean_path) for name, clean_path in clean_paths.items()},
+    )
+    if all(cache.is_fresh(output, sheet_key) for output in outputs):
+        print("\nSpritesheet up to date.")
+        cache.save()
+        return
+
+    # Unchanged frames: their -clean.png holds exactly the processed pixels
+    for name, clean_path in clean_paths.items():
+        if name not in processed:
+            processed[name] = Image.open(clean_path)
+            processed[name].load()
+
     # Create flipped versions
     print("\nCreating flipped versions...")
     processed["front-walk-flip"] = flip_horizontal(processed["front-walk"])
@@ -131,25 +195,22 @@ def build_spritesheet():
     processed["side-walk-flip"] = flip_horizontal(processed["side-walk"])
     processed["back-walk-flip"] = flip_horizontal(processed["back-walk"])
 
-    # Build 3x4 spritesheet (192x256)
-    # Layout:
-    # Row 1 (FRONT): front-idle | front-walk | front-walk-flip
-    # Row 2 (RIGHT): side-idle  | side-walk  | side-idle
-    # Row 3 (LEFT):  side-idle-flip | side-walk-flip | side-idle-flip
-    # Row 4 (BACK):  back-idle  | back-walk  | back-walk-flip
+    if dedupe:
+        write_deduped_sheet(processed)
+    else:
+        write_grid_sheet(processed)
 
-    layout = [
-        ["front-idle", "front-walk", "front-walk-flip"],
-        ["side-idle", "side-walk", "side-idle"],
-        ["side-idle-flip", "side-walk-flip", "side-idle-flip"],
-        ["back-idle", "back-walk", "back-walk-flip"],
-    ]
+    for output in outputs:
+        cache.record(output, sheet_key)
+    cache.save()
 
+def write_grid_sheet(processed):
+    """Save the full 3x4 layout."""
     cols, rows = 3, 4
     sheet = Image.new("RGBA", (cols * FRAME_SIZE, rows * FRAME_SIZE), (0, 0, 0, 0))
 
     print("\nAssembling spritesheet...")
-    for row_idx, row in enumerate(layout):
+    for row_idx, row in enumerate(LAYOUT):
         for col_idx, frame_name in enumerate(row):
             if frame_name in processed:
                 x = col_idx * FRAME_SIZE
@@ -165,4 +226,12 @@ def build_spritesheet():
     print(f"Size: {sheet.width}x{sheet.height} ({cols}x{rows} grid, {FRAME_SIZE}px frames)")
 
 if __name__ == "__main__":
-    build_spritesheet()
+    parser = argparse.ArgumentParser(description="Build clown spritesheet")
+    parser.add_argument("--band-height", type=int, default=DEFAULT_BAND_HEIGHT,
+                        help=f"Rows keyed per band; 0 = whole frame at once (default: {DEFAULT_BAND_HEIGHT})")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Store each unique frame once and emit alias/flipX metadata JSON")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild every frame and the sheet even if inputs are unchanged")
+    args = parser.parse_args()
+    build_spritesheet(args.band_height, args.dedupe, BuildCache(force=args.force))
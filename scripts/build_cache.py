@@ -0,0 +1,114 @@
+"""
+Content-hash build cache for the spritesheet and color-variant scripts.
+
+Each output file is recorded with a key hashed from its inputs' contents and
+the parameters that shape it. A step whose key matches, and whose output is
+still on disk untouched (same size and mtime as when recorded), is skipped.
+File hashes are memoized by (size, mtime) so unchanged inputs aren't re-read.
+
+State lives in .cache/asset-pipeline/build-cache.json (gitignored); delete
+it, or pass --force to the scripts, to rebuild everything.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CACHE_FILE = PROJECT_ROOT / ".cache/asset-pipeline/build-cache.json"
+
+# Bump to invalidate every entry (e.g. after changing the cache format)
+CACHE_VERSION = 1
+
+
+def _stat_signature(path: Path):
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _relative(path: Path) -> str:
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(PROJECT_ROOT.resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+class BuildCache:
+    """Input-hash -> output record store for incremental rebuilds.
+
+    Typical step:
+        key = cache.key("variant", cache.file_hash(source), color)
+        if not cache.is_fresh(output, key):
+            ...build output...
+            cache.record(output, key)
+        cache.save()
+    """
+
+    def __init__(self, path: Path = CACHE_FILE, enabled: bool = True, force: bool = False):
+        self.path = path
+        self.enabled = enabled
+        # force: rebuild everything but still record the results
+        self.force = force
+        self.files = {}
+        self.outputs = {}
+        if enabled:
+            try:
+                data = json.loads(path.read_text())
+                if data.get("version") == CACHE_VERSION:
+                    self.files = data.get("files", {})
+                    self.outputs = data.get("outputs", {})
+            except (OSError, ValueError):
+                pass
+
+    def file_hash(self, path: Path) -> str:
+        """SHA-256 of a file, reused while its size and mtime are unchanged."""
+        path = Path(path)
+        name = _relative(path)
+        signature = _stat_signature(path)
+        if signature is None:
+            return None
+        entry = self.files.get(name)
+        if entry and entry["stat"] == signature:
+            return entry["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        self.files[name] = {"stat": signature, "sha256": digest.hexdigest()}
+        return self.files[name]["sha256"]
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Stable hash of JSON-serializable parts (input hashes, parameters)."""
+        payload = json.dumps([CACHE_VERSION, parts], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def is_fresh(self, output: Path, key: str) -> bool:
+        """True if output was last built from key and hasn't been touched since."""
+        if not self.enabled or self.force:
+            return False
+        entry = self.outputs.get(_relative(output))
+        return bool(entry) and entry["key"] == key and entry["stat"] == _stat_signature(Path(output))
+
+    def record(self, output: Path, key: str):
+        """Note that output (just written) was built from key."""
+        self.outputs[_relative(output)] = {"key": key, "stat": _stat_signature(Path(output))}
+
+    def save(self):
+        """Write the cache atomically; a cache write failure never fails the build."""
+        if not self.enabled:
+            return
+        data = {"version": CACHE_VERSION, "files": self.files, "outputs": self.outputs}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # cache only
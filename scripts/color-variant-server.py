@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Serve clown color variants for any body color, rendered on demand.
+
+GET /clown/<hex>.png (e.g. /clown/800020.png) or /clown/<name>.png for a
+COLOR_VARIANTS name returns clown-spritesheet.png with the white body
+recolored - the same pixels generate-color-variants.py would bake.
+
+Rendering uses one image_ops.RecolorEngine for the sheet (mask computed
+once; reloaded when the sheet changes), so a cold color costs one table
+gather plus the PNG encode. Encoded PNGs are kept in an in-memory LRU and
+an on-disk cache (.cache/asset-pipeline/variants), each with a byte budget
+and least-recently-used eviction. Responses carry a content-hash ETag and
+If-None-Match gets a 304.
+
+Usage:
+    python scripts/color-variant-server.py [--port 8765] [--memory-mb 64] [--disk-mb 256]
+
+    curl -O http://127.0.0.1:8765/clown/ff8800.png
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+SCRIPTS_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from image_ops import RecolorEngine
+
+PROJECT_ROOT = SCRIPTS_DIR.parent
+DEFAULT_SOURCE = PROJECT_ROOT / "public/assets/characters/clown-spritesheet.png"
+DISK_CACHE_DIR = PROJECT_ROOT / ".cache/asset-pipeline/variants"
+
+DEFAULT_PORT = 8765
+DEFAULT_MEMORY_MB = 64
+DEFAULT_DISK_MB = 256
+
+ROUTE = re.compile(r"^/clown/(?:%23|#)?([0-9A-Za-z-]+)\.png$")
+HEX_COLOR = re.compile(r"^[0-9a-fA-F]{6}$")
+
+
+def load_color_variants() -> dict:
+    """COLOR_VARIANTS from generate-color-variants.py (hyphenated, so loaded by path)."""
+    spec = importlib.util.spec_from_file_location(
+        "generate_color_variants", SCRIPTS_DIR / "generate-color-variants.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.COLOR_VARIANTS
+
+
+def parse_color(token: str, named: dict):
+    """RGB tuple for a hex string or COLOR_VARIANTS name, or None."""
+    if token.lower() in named:
+        return tuple(named[token.lower()])
+    if HEX_COLOR.match(token):
+        return tuple(int(token[i:i + 2], 16) for i in (0, 2, 4))
+    return None
+
+
+class MemoryLRU:
+    """Thread-safe key -> (png bytes, etag) LRU bounded by total bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, data: bytes, etag: str):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self.entries[key] = (data, etag)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class DiskLRU:
+    """PNG files under a directory, evicted least-recently-used past a byte budget.
+
+    Recency is the file mtime, bumped on every hit, so the order survives
+    restarts; sizes are indexed once at startup.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.files = {}
+        root.mkdir(parents=True, exist_ok=True)
+        for path in root.glob("*.png"):
+            st = path.stat()
+            self.files[path.name] = (st.st_mtime_ns, st.st_size)
+        self.size = sum(size for _, size in self.files.values())
+        self._evict()
+
+    def get(self, key: str):
+        path = self.root / f"{key}.png"
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+        with self.lock:
+            self.files[path.name] = (path.stat().st_mtime_ns, len(data))
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self.root / f"{key}.png"
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return  # cache only
+        with self.lock:
+            old = self.files.get(path.name)
+            self.size += len(data) - (old[1] if old else 0)
+            self.files[path.name] = (path.stat().st_mtime_ns, len(data))
+            self._evict()
+
+    def _evict(self):
+        if self.size <= self.max_bytes:
+            return
+        for name, (_, size) in sorted(self.files.items(), key=lambda item: item[1][0]):
+            if self.size <= self.max_bytes:
+                break
+            try:
+                (self.root / name).unlink()
+            except OSError:
+                pass
+            del self.files[name]
+            self.size -= size
+
+
+class VariantRenderer:
+    """Renders and caches recolored sheets, keyed on the source content hash."""
+
+    def __init__(self, source: Path, memory: MemoryLRU, disk: DiskLRU):
+        self.source = source
+        self.memory = memory
+        self.disk = disk
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self._stat = None
+        # (source hash, engine, source image), replaced as one tuple so a
+        # reader never pairs one sheet's hash with another's pixels
+        self.snapshot = None
+        self._load_source()
+
+    def _load_source(self):
+        mtime = self.source.stat().st_mtime_ns
+        data = self.source.read_bytes()
+        img = Image.open(BytesIO(data))
+        img.load()
+        source_hash = hashlib.sha256(data).hexdigest()[:16]
+        # Swap in only once the new sheet has fully loaded
+        self.snapshot = (source_hash, RecolorEngine(img), img)
+        self._stat = mtime
+        print(f"Loaded {self.source.name} ({img.width}x{img.height}, {source_hash})")
+
+    def _check_source(self) -> tuple:
+        """Reload the sheet if it changed; returns the (hash, engine, image) snapshot to use."""
+        with self.lock:
+            try:
+                if self.source.stat().st_mtime_ns != self._stat:
+                    self._load_source()
+            except (OSError, SyntaxError, ValueError) as e:
+                # Sheet missing or half-written mid-rebuild: keep serving the
+                # last good one and retry on the next request
+                print(f"Warning: Can't reload {self.source.name} ({e}), serving the previous sheet")
+            return self.snapshot
+
+    def get(self, rgb) -> tuple:
+        """(png bytes, etag) for a body color."""
+        snapshot = self._check_source()
+        key = f"{snapshot[0]}-{'{:02x}{:02x}{:02x}'.format(*rgb)}"
+
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry
+
+        # One render per key at a time; concurrent requests wait for it
+        with self.lock:
+            key_lock = self.inflight.setdefault(key, threading.Lock())
+        with key_lock:
+            entry = self.memory.get(key)
+            if entry is None:
+                data = self.disk.get(key)
+                if data is None:
+                    data = self._render(snapshot, rgb)
+                    self.disk.put(key, data)
+                entry = (data, f'"{hashlib.sha256(data).hexdigest()[:32]}"')
+                self.memory.put(key, *entry)
+        with self.lock:
+            self.inflight.pop(key, None)
+        return entry
+
+    @staticmethod
+    def _render(snapshot: tuple, rgb) -> bytes:
+        _, engine, source_img = snapshot
+        img = source_img if rgb == (255, 255, 255) else engine.render(rgb)
+        buffer = BytesIO()
+        img.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+def make_handler(renderer: VariantRenderer, named: dict):
+    class VariantHandler(BaseHTTPRequestHandler):
+        server_version = "ClownVariants/1.0"
+
+        def do_GET(self):
+            match = ROUTE.match(self.path.split("?", 1)[0])
+            rgb = parse_color(match.group(1), named) if match else None
+            if rgb is None:
+                self.send_error(HTTPStatus.NOT_FOUND, "Expected /clown/<rrggbb>.png or /clown/<name>.png")
+                return
+
+            data, etag = renderer.get(rgb)
+            if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("ETag", etag)
+            # Same URL after a sheet rebuild: revalidate (cheap with the ETag)
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(data)
+
+    return VariantHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve clown color variants for any hex color")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--source", type=Path, default=DEFAULT_SOURCE,
+                        help="Spritesheet to recolor (default: clown-spritesheet.png)")
+    parser.add_argument("--memory-mb", type=float, default=DEFAULT_MEMORY_MB,
+                        help=f"In-memory cache budget (default: {DEFAULT_MEMORY_MB} MB)")
+    parser.add_argument("--disk-mb", type=float, default=DEFAULT_DISK_MB,
+                        help=f"Disk cache budget (default: {DEFAULT_DISK_MB} MB)")
+    parser.add_argument("--cache-dir", type=Path, default=DISK_CACHE_DIR,
+                        help="Disk cache directory (default: .cache/asset-pipeline/variants)")
+    args = parser.parse_args()
+
+    if not args.source.exists():
+        print(f"Error: Source file not found: {args.source}")
+        sys.exit(1)
+
+    renderer = VariantRenderer(
+        args.source,
+        MemoryLRU(int(args.memory_mb * 1024 * 1024)),
+        DiskLRU(args.cache_dir, int(args.disk_mb * 1024 * 1024)),
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(renderer, load_color_variants()))
+    print(f"Serving color variants on http://{args.host}:{args.port}/clown/<rrggbb>.png")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,43 @@
 Generate color variants of the clown spritesheet.
 Replaces white body (#FFFFFF) with different colors.
 
-Usage: python generate-color-variants.py
+The recolor mask is computed once for the sheet (image_ops.RecolorEngine)
+and every color rendered from it; PNGs are encoded on a thread pool.
+
+With --deduped, recolors clown-spritesheet-deduped.png (from
+build-spritesheet.py --dedupe) into clown-<color>-deduped.png; every
+variant shares clown-spritesheet-deduped.json for frame aliases/flips.
+
+With --tintable, also writes one runtime-tintable set in place of N
+baked sheets: clown-tint-base.png (the sheet with the body cleared),
+clown-tint-mask.png (body luminance as grey, for Phaser's setTint) and
+clown-palette.json (tint values for every color). With --indexed, each
+baked variant is also written as a palette PNG, clown-<color>-indexed.png.
+
+Variants already built from the current source sheet are skipped
+(see build_cache.py).
+
+Usage: python generate-color-variants.py [--band-height ROWS] [--deduped] [--force] [--workers N]
+                                         [--tintable] [--indexed]
 """
 
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from PIL import Image
-import numpy as np
+
+SCRIPTS_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from build_cache import BuildCache
+from image_ops import DEFAULT_BAND_HEIGHT, RecolorEngine, to_indexed
 
 CHAR_DIR = Path(__file__).parent.parent / "public/assets/characters"
 SOURCE_FILE = CHAR_DIR / "clown-spritesheet.png"
+DEDUPED_SOURCE_FILE = CHAR_DIR / "clown-spritesheet-deduped.png"
 
 # Color variants (name, hex, RGB tuple)
 # Body colors - replacing white (#FFFFFF)
@@ -25,78 +53,117 @@ COLOR_VARIANTS = {
     "orange": (255, 200, 100),     # Soft orange
 }
 
-def replace_white_with_color(img, target_color):
-    """Replace white/grayscale pixels with target color, preserving shading.
-
-    This handles both the bright white body AND the anti-aliased gray edge pixels
-    that transition from white to the black outline.
-    """
-    img = img.convert("RGBA")
-    data = np.array(img, dtype=np.float32)
-
-    r, g, b, a = data[:,:,0], data[:,:,1], data[:,:,2], data[:,:,3]
-
-    # Find grayscale pixels (R, G, B are similar to each other)
-    # This catches both bright white AND the gray anti-aliased edges
-    is_grayscale = (np.abs(r - g) < 40) & (np.abs(g - b) < 40) & (np.abs(r - b) < 40)
-
-    # Exclude very dark pixels (the black outline) and transparent pixels
-    # The outline is typically < 50 brightness
-    avg_brightness = (r + g + b) / 3
-    is_not_black = avg_brightness > 60
-    is_visible = a > 0
-
-    # Also exclude the red nose area - red has high R, low G/B
-    is_not_red = ~((r > 150) & (g < 100) & (b < 100))
-
-    # Mask for pixels to recolor (white body + gray edges, not outline or nose)
-    recolor_mask = is_grayscale & is_not_black & is_visible & is_not_red
-
-    # Calculate brightness/luminance of original pixels (0-1 scale)
-    luminance = avg_brightness / 255.0
-
-    # Apply target color with original luminance preserved
-    target_r, target_g, target_b = target_color
-
-    # For body/edge pixels, tint them with the target color
-    # Preserve the luminance variation for shading and anti-aliasing
-    new_r = np.where(recolor_mask, luminance * target_r, r)
-    new_g = np.where(recolor_mask, luminance * target_g, g)
-    new_b = np.where(recolor_mask, luminance * target_b, b)
-
-    # Clamp values
-    new_r = np.clip(new_r, 0, 255)
-    new_g = np.clip(new_g, 0, 255)
-    new_b = np.clip(new_b, 0, 255)
-
-    # Reconstruct image
-    result = np.stack([new_r, new_g, new_b, a], axis=2).astype(np.uint8)
-    return Image.fromarray(result)
-
-def generate_variants():
-    print(f"Loading source: {SOURCE_FILE}")
-
-    if not SOURCE_FILE.exists():
-        print(f"Error: Source file not found: {SOURCE_FILE}")
+# Bump when the recolor output changes so cached variants rebuild
+BUILD_VERSION = 1
+
+def generate_variants(band_height: int = DEFAULT_BAND_HEIGHT, deduped: bool = False,
+                      cache: BuildCache = None, workers: int = None,
+                      tintable: bool = False, indexed: bool = False):
+    cache = cache or BuildCache()
+    source_file = DEDUPED_SOURCE_FILE if deduped else SOURCE_FILE
+    suffix = "-deduped" if deduped else ""
+    print(f"Loading source: {source_file}")
+
+    if not source_file.exists():
+        print(f"Error: Source file not found: {source_file}")
+        if deduped:
+            print("Run build-spritesheet.py --dedupe first.")
         return
 
-    source_img = Image.open(SOURCE_FILE)
+    source_img = Image.open(source_file)
+    source_hash = cache.file_hash(source_file)
     print(f"Source size: {source_img.width}x{source_img.height}")
 
+    # (outputs, cache key, job) - job(engine) writes the outputs, returns a log line
+    jobs = []
     for color_name, color_rgb in COLOR_VARIANTS.items():
-        output_file = CHAR_DIR / f"clown-{color_name}.png"
-
-        if color_name == "white":
-            # Just copy the original for white
-            source_img.save(output_file)
-            print(f"  {color_name}: copied original -> {output_file.name}")
+        output_file = CHAR_DIR / f"clown-{color_name}{suffix}.png"
+        jobs.append(([output_file], cache.key("variant", BUILD_VERSION, source_hash, color_rgb),
+                     lambda engine, n=color_name, c=color_rgb, o=output_file: render_variant(engine, source_img, n, c, o)))
+        if indexed:
+            output_file = CHAR_DIR / f"clown-{color_name}{suffix}-indexed.png"
+            jobs.append(([output_file], cache.key("indexed", BUILD_VERSION, source_hash, color_rgb),
+                         lambda engine, n=color_name, c=color_rgb, o=output_file: render_indexed(engine, source_img, n, c, o)))
+    if tintable:
+        outputs = [CHAR_DIR / f"clown-tint-base{suffix}.png", CHAR_DIR / f"clown-tint-mask{suffix}.png",
+                   CHAR_DIR / f"clown-palette{suffix}.json"]
+        jobs.append((outputs, cache.key("tintable", BUILD_VERSION, source_hash, COLOR_VARIANTS),
+                     lambda engine, o=outputs: write_tintable(engine, *o)))
+
+    pending = []
+    for outputs, key, job in jobs:
+        if all(cache.is_fresh(output, key) for output in outputs):
+            print(f"  unchanged -> {', '.join(output.name for output in outputs)}")
         else:
-            # Generate color variant
-            variant = replace_white_with_color(source_img, color_rgb)
-            variant.save(output_file)
-            print(f"  {color_name}: {color_rgb} -> {output_file.name}")
-
-    print(f"\nGenerated {len(COLOR_VARIANTS)} color variants!")
+            pending.append((outputs, key, job))
+
+    if pending:
+        # Mask and luminance are computed once here; each color is then a
+        # table lookup, and the PNG encodes (zlib releases the GIL) overlap
+        source_img.load()
+        engine = RecolorEngine(source_img, band_height)
+
+        with ThreadPoolExecutor(max_workers=workers or min(len(pending), os.cpu_count() or 1)) as pool:
+            futures = [(pool.submit(job, engine), outputs, key) for outputs, key, job in pending]
+            for future, outputs, key in futures:
+                print(future.result())
+                for output in outputs:
+                    cache.record(output, key)
+
+    cache.save()
+    print(f"\nGenerated {len(pending)} outputs ({len(jobs) - len(pending)} up to date)!")
+
+def render_variant(engine, source_img, color_name, color_rgb, output_file):
+    if color_name == "white":
+        # Just copy the original for white
+        source_img.save(output_file)
+        return f"  {color_name}: copied original -> {output_file.name}"
+    engine.render(color_rgb).save(output_file)
+    return f"  {color_name}: {color_rgb} -> {output_file.name}"
+
+def render_indexed(engine, source_img, color_name, color_rgb, output_file):
+    """Baked variant as a palette PNG (quantized if it has more than 256 colors)."""
+    variant = source_img if color_name == "white" else engine.render(color_rgb)
+    indexed, exact = to_indexed(variant)
+    indexed.save(output_file, optimize=True)
+    note = "" if exact else " (Warning: more than 256 colors, quantized)"
+    return f"  {color_name}: indexed -> {output_file.name}{note}"
+
+def write_tintable(engine, base_file, tint_file, palette_file):
+    """Base sheet + grey tint layer + palette, for tinting at render time.
+
+    The client draws the base sprite and, on top of it, the tint layer
+    sprite with setTint(colors[name].tint); that matches the baked
+    clown-<color>.png to within one level per channel, for any color.
+    """
+    base, tint = engine.tint_layers()
+    base.save(base_file, optimize=True)
+    tint.save(tint_file, optimize=True)
+    palette = {
+        "base": base_file.name,
+        "tint": tint_file.name,
+        "colors": {
+            name: {"hex": "#{:02x}{:02x}{:02x}".format(*rgb), "tint": (rgb[0] << 16) | (rgb[1] << 8) | rgb[2]}
+            for name, rgb in COLOR_VARIANTS.items()
+        },
+    }
+    palette_file.write_text(json.dumps(palette, indent=2) + "\n")
+    return f"  tintable: {base_file.name} + {tint_file.name} + {palette_file.name}"
 
 if __name__ == "__main__":
-    generate_variants()
+    parser = argparse.ArgumentParser(description="Generate clown color variants")
+    parser.add_argument("--band-height", type=int, default=DEFAULT_BAND_HEIGHT,
+                        help=f"Rows processed per band; 0 = whole image at once (default: {DEFAULT_BAND_HEIGHT})")
+    parser.add_argument("--deduped", action="store_true",
+                        help="Recolor the deduplicated spritesheet (build-spritesheet.py --dedupe)")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate every variant even if the source is unchanged")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parallel PNG encodes (default: one per variant, up to the CPU count)")
+    parser.add_argument("--tintable", action="store_true",
+                        help="Also write the tint base/mask sheets and palette JSON for render-time tinting")
+    parser.add_argument("--indexed", action="store_true",
+                        help="Also write each variant as an indexed-palette PNG (quantized above 256 colors)")
+    args = parser.parse_args()
+    generate_variants(args.band_height, args.deduped, BuildCache(force=args.force), args.workers,
+                      args.tintable, args.indexed)
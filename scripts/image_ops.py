@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+Shared image kernels for the asset pipeline scripts.
+
+ingest_image.py, build-spritesheet.py, process-cosmetic.py and
+generate-color-variants.py all import their background removal, recolor
+and resize helpers from here, so an optimization
+lands in every pipeline at once. Kernels that differ from the code they
+replaced keep that code as a *_reference() function; `--check` verifies
+they still produce identical output.
+
+Green-screen keying is done with a precomputed lookup table: the output
+alpha and defringed green channel only depend on a pixel's (r, g, b), so
+they are computed once for all 2^24 colors (cached on disk under
+.cache/asset-pipeline/luts) and applied with a single gather over uint8
+data. The original float32 implementation is kept as
+remove_green_background_reference() and is what the table is built from,
+so the output is bit-identical.
+
+Per-pixel kernels (green key, white-body recolor) run over horizontal
+bands of band_height rows, writing into one preallocated output, so their
+temporaries are bounded by the band size rather than the image size - a
+4096x4096 sheet no longer balloons into a gigabyte of float32 arrays.
+Pass band_height=None to process the whole frame in one go.
+
+RecolorEngine prepares the white-body mask and per-pixel channel sums once
+so several colors can be rendered from one sheet; each color is a lookup
+into a 766-entry table built with the reference's float32 ops.
+
+Usage:
+    # Check every kernel against its reference on synthetic inputs
+    python scripts/image_ops.py --check
+
+    # ...and on real images
+    python scripts/image_ops.py --check sprite.png other.png
+"""
+
+import importlib.util
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from PIL import Image
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# numpy is imported by the kernels that use it, so importing this module
+# for resize_exact()/fit_within() alone stays cheap
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+LUT_CACHE_DIR = Path(__file__).parent.parent / ".cache/asset-pipeline/luts"
+
+# Bump when the reference green key changes so a stale LUT isn't reused
+GREEN_KEY_LUT_VERSION = 1
+
+# Rows per band for striped kernels (~1MB of float32 per channel at 1024px)
+DEFAULT_BAND_HEIGHT = 256
+
+_green_key_lut = None
+_green_key_lut_lock = threading.Lock()
+
+
+def _green_key_reference_array(data: "np.ndarray") -> "np.ndarray":
+    """Reference green key on an HxWx4 RGBA array (float32 math)."""
+    import numpy as np
+
+    data = data.astype(np.float32)
+
+    r, g, b, a = data[:,:,0], data[:,:,1], data[:,:,2], data[:,:,3]
+
+    # Detect green-ish background: green is highest channel, blue is low
+    # This catches both pure green AND yellow-green backgrounds
+    is_green_dominant = (g > r) & (g > b) & (b < 100)
+
+    # Background pixels are bright and green-dominant
+    is_background = is_green_dominant & (g > 150)
+
+    # For edge detection, calculate how "green" each pixel is
+    # Higher ratio = more background-like
+    green_ratio = np.where(g > 0, g / (r + b + 1), 0)
+
+    # Soft edges: pixels that are somewhat green get partial transparency
+    # This handles anti-aliased edges smoothly
+    edge_greenness = np.clip((green_ratio - 0.8) / 0.7, 0, 1)
+
+    # Combine: definite background = 0 alpha, edges = partial alpha
+    alpha_factor = np.where(is_background, 0, 1 - edge_greenness * 0.8)
+
+    # Also catch any pixel where green significantly exceeds other channels
+    strong_green = (g > 180) & (g > r + 30) & (g > b + 100)
+    alpha_factor = np.where(strong_green, 0, alpha_factor)
+
+    # Apply alpha
+    new_alpha = (alpha_factor * 255).astype(np.uint8)
+
+    # For semi-transparent edge pixels, reduce green tint (defringe)
+    edge_mask = (new_alpha > 0) & (new_alpha < 240)
+    if np.any(edge_mask):
+        # Reduce green channel on edges to remove green fringe
+        g_adjusted = np.where(edge_mask, np.minimum(g, (r + b) / 2 * 1.2), g)
+        data[:,:,1] = g_adjusted
+
+    # Rebuild image with new alpha
+    return np.stack([
+        data[:,:,0].astype(np.uint8),
+        data[:,:,1].astype(np.uint8),
+        data[:,:,2].astype(np.uint8),
+        new_alpha
+    ], axis=2)
+
+
+def remove_green_background_reference(img: Image.Image) -> Image.Image:
+    """Remove green background and make transparent with clean edges.
+
+    Handles yellow-green backgrounds like (166, 217, 36) from Gemini.
+    Reference implementation: builds ~10 full-frame float32 temporaries.
+    """
+    import numpy as np
+
+    img = img.convert("RGBA")
+    return Image.fromarray(_green_key_reference_array(np.array(img)))
+
+
+def build_green_key_lut() -> "np.ndarray":
+    """Run the reference green key over every RGB color.
+
+    Returns a (2^24, 2) uint8 table indexed by (r << 16) | (g << 8) | b,
+    holding (alpha, defringed green). Built 16 red values (1M colors) at a
+    time to keep the float32 temporaries small.
+    """
+    import numpy as np
+
+    lut = np.empty((1 << 24, 2), dtype=np.uint8)
+    gb = np.arange(1 << 16, dtype=np.uint32)
+    chunk = np.empty((16, 1 << 16, 4), dtype=np.uint8)
+    chunk[:, :, 1] = (gb >> 8).astype(np.uint8)
+    chunk[:, :, 2] = (gb & 0xFF).astype(np.uint8)
+    chunk[:, :, 3] = 255
+
+    for r0 in range(0, 256, 16):
+        chunk[:, :, 0] = np.arange(r0, r0 + 16, dtype=np.uint8)[:, None]
+        keyed = _green_key_reference_array(chunk)
+        rows = lut[r0 << 16:(r0 + 16) << 16]
+        rows[:, 0] = keyed[:, :, 3].ravel()
+        rows[:, 1] = keyed[:, :, 1].ravel()
+
+    return lut
+
+
+def get_green_key_lut() -> "np.ndarray":
+    """Return the green key LUT, loading it from disk or building it once."""
+    import numpy as np
+
+    global _green_key_lut
+    if _green_key_lut is None:
+        with _green_key_lut_lock:
+            if _green_key_lut is None:
+                path = LUT_CACHE_DIR / f"green-key-v{GREEN_KEY_LUT_VERSION}.npy"
+                lut = None
+                if path.exists():
+                    try:
+                        lut = np.load(path)
+                    except (OSError, ValueError):
+                        lut = None
+                if lut is None or lut.shape != (1 << 24, 2):
+                    print("Building green key lookup table (one-time, a few seconds)...")
+                    lut = build_green_key_lut()
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+                    np.save(tmp_path, lut)
+                    os.replace(tmp_path, path)
+                _green_key_lut = lut
+    return _green_key_lut
+
+
+def apply_striped(kernel, data: "np.ndarray", out: "np.ndarray", band_height: int = DEFAULT_BAND_HEIGHT):
+    """Run an array kernel over horizontal bands of data, writing into out.
+
+    kernel(band) must return the output rows for that band. out may be data
+    itself for in-place kernels. band_height=None runs one full-frame band.
+    """
+    height = data.shape[0]
+    step = band_height or height or 1
+    for top in range(0, height, step):
+        out[top:top + step] = kernel(data[top:top + step])
+    return out
+
+
+def _green_key_lut_band(band: "np.ndarray") -> "np.ndarray":
+    """Apply the green key LUT to one RGBA band in place."""
+    import numpy as np
+
+    lut = get_green_key_lut()
+
+    # Pack (r, g, b) into a 24-bit index
+    index = band[:, :, 0].astype(np.uint32)
+    index <<= 8
+    index |= band[:, :, 1]
+    index <<= 8
+    index |= band[:, :, 2]
+
+    keyed = lut[index]
+    band[:, :, 1] = keyed[:, :, 1]
+    band[:, :, 3] = keyed[:, :, 0]
+    return band
+
+
+def remove_green_background(img: Image.Image, band_height: int = DEFAULT_BAND_HEIGHT) -> Image.Image:
+    """Remove green background and make transparent with clean edges.
+
+    Handles yellow-green backgrounds like (166, 217, 36) from Gemini.
+    Bit-identical to remove_green_background_reference(), but works on uint8
+    data: a uint32 index and one gather into the LUT per band, in place.
+    """
+    import numpy as np
+
+    get_green_key_lut()
+    data = np.array(img.convert("RGBA"))
+    apply_striped(_green_key_lut_band, data, data, band_height)
+    return Image.fromarray(data)
+
+
+def remove_color_key_reference(img: Image.Image, bg_color, tolerance: int = 30) -> Image.Image:
+    """Make pixels within tolerance of bg_color (per channel) transparent.
+
+    Reference implementation: int64 difference array for all three channels.
+    """
+    import numpy as np
+
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+
+    data = np.array(img)
+    bg_color = np.array(bg_color[:3])
+
+    # Create mask for pixels close to background color
+    diff = np.abs(data[:, :, :3].astype(int) - bg_color.astype(int))
+    bg_mask = np.all(diff < tolerance, axis=2)
+
+    # Set background pixels to transparent
+    data[bg_mask] = [0, 0, 0, 0]
+
+    return Image.fromarray(data)
+
+
+def remove_color_key(img: Image.Image, bg_color, tolerance: int = 30) -> Image.Image:
+    """Make pixels within tolerance of bg_color (per channel) transparent.
+
+    Same output as remove_color_key_reference(), using three 256-entry
+    per-channel lookup tables on the uint8 data instead of a widened copy.
+    """
+    import numpy as np
+
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+
+    data = np.array(img)
+    levels = np.arange(256)
+
+    bg_mask = None
+    for channel, value in enumerate(bg_color[:3]):
+        near = np.abs(levels - int(value)) < tolerance
+        channel_mask = near[data[:, :, channel]]
+        if bg_mask is None:
+            bg_mask = channel_mask
+        else:
+            bg_mask &= channel_mask
+
+    data[bg_mask] = 0
+    return Image.fromarray(data)
+
+
+def corner_color(img: Image.Image, x: int = 5, y: int = 5) -> tuple:
+    """RGB color of the pixel at (x, y) - used to detect the background color."""
+    return img.convert('RGB').getpixel((x, y))
+
+
+def resize_exact(img: Image.Image, size) -> Image.Image:
+    """Resize to exactly (width, height) with Lanczos."""
+    return img.resize(tuple(size), Image.Resampling.LANCZOS)
+
+
+def fit_within(img: Image.Image, max_size: int) -> Image.Image:
+    """Shrink to fit within max_size x max_size, keeping aspect ratio.
+
+    Images that already fit are returned unchanged (never upscaled).
+    """
+    width, height = img.size
+
+    # Calculate scale to fit
+    scale = min(max_size / width, max_size / height)
+
+    if scale < 1:
+        new_width = int(width * scale)
+        new_height = int(height * scale)
+        return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+    return img
+
+
+def fit_and_center(img: Image.Image, size: int) -> Image.Image:
+    """Fit within a size x size frame (aspect preserved) and center it.
+
+    Note: shrinks img in place (Image.thumbnail) rather than copying it.
+    """
+    img.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+    # Create new image with padding
+    new_img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+
+    # Center the resized image
+    x = (size - img.width) // 2
+    y = (size - img.height) // 2
+    new_img.paste(img, (x, y), img)
+
+    return new_img
+
+
+def _recolor_reference_array(data: "np.ndarray", target_color) -> "np.ndarray":
+    """Reference white-body recolor on an RGBA uint8 array (float32 math)."""
+    import numpy as np
+
+    data = data.astype(np.float32)
+
+    r, g, b, a = data[:,:,0], data[:,:,1], data[:,:,2], data[:,:,3]
+
+    # Find grayscale pixels (R, G, B are similar to each other)
+    # This catches both bright white AND the gray anti-aliased edges
+    is_grayscale = (np.abs(r - g) < 40) & (np.abs(g - b) < 40) & (np.abs(r - b) < 40)
+
+    # Exclude very dark pixels (the black outline) and transparent pixels
+    # The outline is typically < 50 brightness
+    avg_brightness = (r + g + b) / 3
+    is_not_black = avg_brightness > 60
+    is_visible = a > 0
+
+    # Also exclude the red nose area - red has high R, low G/B
+    is_not_red = ~((r > 150) & (g < 100) & (b < 100))
+
+    # Mask for pixels to recolor (white body + gray edges, not outline or nose)
+    recolor_mask = is_grayscale & is_not_black & is_visible & is_not_red
+
+    # Calculate brightness/luminance of original pixels (0-1 scale)
+    luminance = avg_brightness / 255.0
+
+    # Apply target color with original luminance preserved
+    target_r, target_g, target_b = target_color
+
+    # For body/edge pixels, tint them with the target color
+    # Preserve the luminance variation for shading and anti-aliasing
+    new_r = np.where(recolor_mask, luminance * target_r, r)
+    new_g = np.where(recolor_mask, luminance * target_g, g)
+    new_b = np.where(recolor_mask, luminance * target_b, b)
+
+    # Clamp values
+    new_r = np.clip(new_r, 0, 255)
+    new_g = np.clip(new_g, 0, 255)
+    new_b = np.clip(new_b, 0, 255)
+
+    # Reconstruct image
+    return np.stack([new_r, new_g, new_b, a], axis=2).astype(np.uint8)
+
+
+def replace_white_with_color_reference(img: Image.Image, target_color) -> Image.Image:
+    """Replace white/grayscale pixels with target color, preserving shading.
+
+    This handles both the bright white body AND the anti-aliased gray edge pixels
+    that transition from white to the black outline.
+    Reference implementation: whole-frame float32 temporaries.
+    """
+    import numpy as np
+
+    img = img.convert("RGBA")
+    return Image.fromarray(_recolor_reference_array(np.array(img), target_color))
+
+
+def replace_white_with_color(img: Image.Image, target_color,
+                             band_height: int = DEFAULT_BAND_HEIGHT) -> Image.Image:
+    """Replace white/grayscale pixels with target color, preserving shading.
+
+    Same math (and output) as replace_white_with_color_reference(), run one
+    band at a time into a preallocated uint8 output.
+    """
+    import numpy as np
+
+    data = np.asarray(img.convert("RGBA"))
+    out = np.empty_like(data)
+    apply_striped(lambda band: _recolor_reference_array(band, target_color), data, out, band_height)
+    return Image.fromarray(out)
+
+
+def _recolor_lut(target_color) -> "np.ndarray":
+    """Recolored RGB for every r+g+b sum (0..765) as a (766, 3) uint8 table.
+
+    A recolored pixel's output only depends on its channel sum, and this
+    runs the reference's float32 ops on exactly those sums, so the table
+    matches _recolor_reference_array() bit for bit.
+    """
+    import numpy as np
+
+    avg_brightness = np.arange(766, dtype=np.float32) / 3
+    luminance = avg_brightness / 255.0
+    channels = [np.clip(luminance * channel, 0, 255) for channel in target_color]
+    return np.stack(channels, axis=1).astype(np.uint8)
+
+
+# Channel sum marking a pixel the recolor leaves alone
+_KEEP_PIXEL = 0xFFFF
+
+
+def _recolor_sums_band(band: "np.ndarray") -> "np.ndarray":
+    """r+g+b per pixel for recolorable pixels, _KEEP_PIXEL for the rest (one RGBA band)."""
+    import numpy as np
+
+    r, g, b, a = (band[:, :, i].astype(np.int16) for i in range(4))
+    sums = (r + g + b).astype(np.uint16)
+
+    # Same tests as _recolor_reference_array(); on integer channels they're exact
+    is_grayscale = (np.abs(r - g) < 40) & (np.abs(g - b) < 40) & (np.abs(r - b) < 40)
+    is_not_black = (np.arange(766, dtype=np.float32) / 3 > 60)[sums]
+    is_not_red = ~((r > 150) & (g < 100) & (b < 100))
+    recolor_mask = is_grayscale & is_not_black & (a > 0) & is_not_red
+
+    sums[~recolor_mask] = _KEEP_PIXEL
+    return sums
+
+
+class RecolorEngine:
+    """White-body recolor prepared once, rendered for any number of colors.
+
+    The mask and per-pixel channel sums (the luminance) are computed once
+    per source image and kept as one uint16 per pixel, _KEEP_PIXEL marking
+    pixels left alone; each render() is then a copy plus one gather per
+    band from a 766-entry table for the target color, so temporaries stay
+    bounded by band_height. Output is identical to
+    replace_white_with_color() / replace_white_with_color_reference().
+    """
+
+    def __init__(self, img: Image.Image, band_height: int = DEFAULT_BAND_HEIGHT):
+        import numpy as np
+
+        self.data = np.asarray(img.convert("RGBA"))
+        self.band_height = band_height
+        self.sums = np.empty(self.data.shape[:2], dtype=np.uint16)
+        apply_striped(_recolor_sums_band, self.data, self.sums, band_height)
+
+    def _bands(self):
+        """(row slice, recolor mask, channel sums of masked pixels) per band."""
+        height = self.sums.shape[0]
+        step = self.band_height or height or 1
+        for top in range(0, height, step):
+            rows = slice(top, top + step)
+            sums = self.sums[rows]
+            mask = sums != _KEEP_PIXEL
+            yield rows, mask, sums[mask]
+
+    def render(self, target_color) -> Image.Image:
+        """The source with its white body recolored to target_color."""
+        lut = _recolor_lut(target_color)
+        out = self.data.copy()
+        for rows, mask, sums in self._bands():
+            out[rows][mask, :3] = lut[sums]
+        return Image.fromarray(out)
+
+    def tint_layers(self) -> tuple:
+        """Split the source into (base, tint) images for render-time tinting.
+
+        base is the source with the recolorable pixels cleared; tint holds
+        only those pixels, as grey luminance (r+g+b)/3 with their original
+        alpha. tint drawn with a multiply tint of the target color (Phaser's
+        setTint) over base matches render(target) to within one level.
+        """
+        import numpy as np
+
+        base = self.data.copy()
+        tint = np.zeros_like(self.data)
+        for rows, mask, sums in self._bands():
+            base[rows][mask] = 0
+            tint[rows][mask, :3] = ((sums + 1) // 3).astype(np.uint8)[:, None]
+            tint[rows][mask, 3] = self.data[rows][mask, 3]
+        return Image.fromarray(base), Image.fromarray(tint)
+
+
+def to_indexed(img: Image.Image, colors: int = 256) -> tuple:
+    """Convert to a palette ("P") image with per-entry alpha.
+
+    Returns (image, exact). With at most `colors` distinct colors (fully
+    transparent pixels count as one) the palette is exact; otherwise the
+    image is quantized (fast octree, no dithering) and exact is False.
+    """
+    import numpy as np
+
+    data = np.array(img.convert("RGBA"))
+    data[data[:, :, 3] == 0] = 0
+    normalized = Image.fromarray(data)
+    if normalized.getcolors(colors) is None:
+        quantized = normalized.quantize(colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        return quantized, False
+
+    palette, index = np.unique(data.reshape(-1, 4), axis=0, return_inverse=True)
+    indexed = Image.fromarray(index.reshape(data.shape[:2]).astype(np.uint8), "P")
+    indexed.putpalette(palette.tobytes(), rawmode="RGBA")
+    return indexed, True
+
+
+def _synthetic_check_images() -> list:
+    """Inputs for --check when no images are given: noise and a keyed sprite."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    noise = Image.fromarray(rng.integers(0, 256, (256, 256, 4), dtype=np.uint8))
+
+    sprite = np.empty((256, 256, 3), dtype=np.uint8)
+    sprite[:] = (141, 206, 74)  # Gemini lime
+    yy, xx = np.mgrid[:256, :256]
+    body = (yy - 128) ** 2 + (xx - 128) ** 2 < 80 ** 2
+    sprite[body] = (245, 245, 245)
+    sprite[(yy - 128) ** 2 + (xx - 128) ** 2 < 12 ** 2] = (220, 20, 30)
+    return [("<noise>", noise), ("<sprite>", Image.fromarray(sprite))]
+
+
+# (name, optimized kernel, reference kernel) pairs checked by --check
+CHECKED_KERNELS = [
+    ("remove_green_background",
+     remove_green_background, remove_green_background_reference),
+    ("remove_color_key",
+     lambda img: remove_color_key(img, corner_color(img)),
+     lambda img: remove_color_key_reference(img, corner_color(img))),
+    # Odd band height so band edges land mid-feature
+    ("remove_green_background/striped",
+     lambda img: remove_green_background(img, band_height=7), remove_green_background_reference),
+    ("replace_white_with_color",
+     lambda img: replace_white_with_color(img, (128, 0, 32), band_height=7),
+     lambda img: replace_white_with_color_reference(img, (128, 0, 32))),
+    ("RecolorEngine",
+     lambda img: RecolorEngine(img, band_height=7).render((100, 149, 237)),
+     lambda img: replace_white_with_color_reference(img, (100, 149, 237))),
+]
+
+
+def main():
+    import argparse
+    import numpy as np
+    parser = argparse.ArgumentParser(description='Shared image kernels for the asset pipeline')
+    parser.add_argument('images', nargs='*', help='Images to check kernels against their references')
+    parser.add_argument('--check', action='store_true',
+                        help='Compare each optimized kernel with its reference implementation')
+    args = parser.parse_args()
+
+    if not args.check:
+        parser.print_help()
+        return
+
+    get_green_key_lut()
+
+    if args.images:
+        inputs = [(path, Image.open(path)) for path in args.images]
+    else:
+        inputs = _synthetic_check_images()
+
+    failures = 0
+    for label, img in inputs:
+        for name, kernel, reference in CHECKED_KERNELS:
+            expected = np.array(reference(img))
+            actual = np.array(kernel(img))
+            ok = np.array_equal(expected, actual)
+            failures += not ok
+            print(f"  {'OK  ' if ok else 'DIFF'}  {name:<24} {label}")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
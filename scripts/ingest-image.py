@@ -7,7 +7,8 @@ Processes AI-generated images through:
 2. Remove Gemini watermark → _processed/
 3. Optional: Remove background (green screen or AI-based)
 4. Optional resize → final destination
-5. Update manifest with metadata
+5. Update manifest with metadata (appended to manifest.jsonl, compacted into
+   manifest.json at the end of each run)
 
 Usage:
     # Single file
@@ -16,7 +17,13 @@ Usage:
     # Batch mode
     python ingest-image.py *.png --theme default --zone arcade
 
-    # Watch mode (monitors incoming/ folder)
+    # Batch mode across 4 worker processes
+    python ingest-image.py *.png --theme default --zone arcade --jobs 4
+
+    # Bulk regeneration: inpaint watermarks 8 images per LaMa pass
+    python ingest-image.py *.png --theme default --zone arcade --inpaint-batch 8
+
+    # Watch mode (monitors incoming/ folder; event-driven with watchdog installed)
     python ingest-image.py --watch
 
     # With resize
@@ -28,18 +35,43 @@ Usage:
     # Sprite with AI background removal (any background)
     python ingest-image.py sprite.png --theme default --zone lobby --remove-bg
 
+    # Release build: slowest, smallest PNGs
+    python ingest-image.py *.png --theme default --zone lobby --png-preset release
+
+    # Also write WebP/AVIF next to the final PNG (listed under "variants" in the manifest)
+    python ingest-image.py bg.png --theme default --zone lobby --formats webp,avif
+
+    # Plus bg-480w.png, bg-960w.png, ... (listed under "srcset")
+    python ingest-image.py bg.png --theme default --zone lobby --formats webp --widths 480,960,1440
+
 Future (Phase 2):
     python ingest-image.py crown.png --type cosmetic --slot head --id crown
 """
 
 import argparse
+import cProfile
+import hashlib
+import importlib.util
 import json
+import os
+import queue
 import shutil
 import sys
+import threading
 import time
+import tracemalloc
+import zlib
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:
+    # Windows: fall back to msvcrt byte-range locks
+    fcntl = None
+    import msvcrt
+
 # Add scripts dir to path for local imports
 SCRIPTS_DIR = Path(__file__).parent
 sys.path.insert(0, str(SCRIPTS_DIR))
@@ -50,34 +82,57 @@ except ImportError:
     print("PIL not found. Install with: pip install Pillow")
     sys.exit(1)
 
-# Import watermark removal from existing script
+# Import watermark removal from existing script (cheap: it only locates
+# OpenCV/LaMa and imports them when a watermark is actually removed)
 try:
-    from remove_watermark import remove_watermark_lama, remove_watermark_inpaint, HAS_LAMA
+    from remove_watermark import (
+        remove_watermark_lama, remove_watermark_lama_batch, remove_watermark_inpaint,
+        warm_up_lama, find_watermark, watermark_present, HAS_LAMA, WATERMARK_PRESENCE_THRESHOLD,
+    )
 except ImportError:
     # Fallback if module import fails
     HAS_LAMA = False
-    def remove_watermark_lama(img, size=60):
+    WATERMARK_PRESENCE_THRESHOLD = 0.2
+
+    def warm_up_lama():
+        return False
+
+    def find_watermark(img, size=60):
+        return None
+
+    def watermark_present(img, threshold=WATERMARK_PRESENCE_THRESHOLD, found=None):
+        return True, None
+
+    def remove_watermark_lama_batch(images, size=60, batch_size=8, locations=None):
+        return [remove_watermark_lama(img, size) for img in images]
+
+    def remove_watermark_lama(img, size=60, location=None):
         print("Warning: LaMa not available, using basic method")
         return remove_watermark_inpaint(img, size)
 
-    def remove_watermark_inpaint(img, size=60):
+    def remove_watermark_inpaint(img, size=60, location=None):
         # Basic fallback - just return image
         print("Warning: No watermark removal available")
         return img
 
-# Optional: rembg for AI-based background removal
-try:
-    from rembg import remove as rembg_remove
-    HAS_REMBG = True
-except ImportError:
-    HAS_REMBG = False
+# Optional: rembg for AI-based background removal. Only located here; it
+# loads onnxruntime, so it is imported on the first --remove-bg image.
+HAS_REMBG = importlib.util.find_spec("rembg") is not None
 
-# Optional: numpy for green screen removal
+# Optional: watchdog for event-driven watch mode (falls back to polling)
 try:
-    import numpy as np
-    HAS_NUMPY = True
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    HAS_WATCHDOG = True
 except ImportError:
-    HAS_NUMPY = False
+    HAS_WATCHDOG = False
+
+# Shared kernels; green screen removal needs numpy
+from image_ops import DEFAULT_BAND_HEIGHT, HAS_NUMPY, remove_green_background as green_key, resize_exact
+from derivatives import (
+    DEFAULT_WIDTHS, FORMATS as DERIVATIVE_FORMATS, encode_derivatives, parse_formats, parse_widths,
+    remove_derivatives, remove_pyramid, write_pyramid,
+)
 
 # Project paths
 PROJECT_ROOT = SCRIPTS_DIR.parent
@@ -86,6 +141,35 @@ INCOMING_DIR = THEMES_DIR / "incoming"
 ORIGINALS_DIR = THEMES_DIR / "_originals"
 PROCESSED_DIR = THEMES_DIR / "_processed"
 
+# Memoized stage outputs, keyed by content hash (safe to delete at any time)
+CACHE_DIR = PROJECT_ROOT / ".cache/asset-pipeline"
+STAGE_CACHE_DIR = CACHE_DIR / "stages"
+# Bump when a stage's implementation changes so stale outputs aren't reused
+STAGE_CACHE_VERSION = 6
+# Size cap for the stage cache; least-recently-used entries are pruned past it
+STAGE_CACHE_MAX_MB = 1024
+# Per-file stage timings (one JSON object per line)
+TIMINGS_LOG = CACHE_DIR / "ingest-timings.jsonl"
+
+# PNG encoder settings. PNG encoding of 1-2MP images dominates the non-ML
+# part of the pipeline, so watch mode trades a few % of size for speed.
+PNG_STRATEGIES = {
+    "default": zlib.Z_DEFAULT_STRATEGY,
+    "filtered": zlib.Z_FILTERED,
+    "huffman": zlib.Z_HUFFMAN_ONLY,
+    "rle": zlib.Z_RLE,
+    "fixed": zlib.Z_FIXED,
+}
+
+PNG_PRESETS = {
+    # ~4x faster than default; within a few % of its size on backgrounds
+    "fast": {"compress_level": 1, "strategy": "rle", "optimize": False},
+    # Pillow's defaults
+    "default": {"compress_level": 6, "strategy": "default", "optimize": False},
+    # Smallest files for release builds, several times slower
+    "release": {"compress_level": 9, "strategy": "filtered", "optimize": True},
+}
+
 # Asset types (extensible for Phase 2: cosmetics)
 ASSET_TYPES = {
     "theme": {
@@ -118,80 +202,466 @@ def load_manifest(manifest_path: Path) -> dict:
 
 
 def save_manifest(manifest_path: Path, manifest: dict):
-    """Save manifest file."""
+    """Save manifest file (atomically, so readers never see a partial file)."""
     manifest["lastUpdated"] = datetime.now().isoformat()
     manifest_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(manifest_path, "w") as f:
+    tmp_path = manifest_path.with_name(f".{manifest_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
         json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
 
 
-def remove_watermark(img: Image.Image, size: int = 60) -> Image.Image:
-    """Remove Gemini watermark using best available method."""
-    if HAS_LAMA:
-        return remove_watermark_lama(img, size)
-    else:
-        return remove_watermark_inpaint(img, size)
+@contextmanager
+def manifest_lock(manifest_path: Path):
+    """Hold an exclusive lock on a manifest while it is read and rewritten.
+
+    Uses a sidecar .manifest.lock file so parallel workers (--jobs) finishing
+    at the same time don't drop each other's entries.
+    """
+    lock_path = manifest_path.with_name(".manifest.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10s; keep waiting
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
 
 
-def resize_image(img: Image.Image, size_str: str) -> Image.Image:
-    """Resize image to target dimensions (WxH format)."""
-    width, height = map(int, size_str.lower().split("x"))
-    return img.resize((width, height), Image.Resampling.LANCZOS)
+def journal_path_for(manifest_path: Path) -> Path:
+    """Append-only journal that sits next to a manifest.json."""
+    return manifest_path.with_suffix(".jsonl")
 
 
-def remove_green_background(img: Image.Image) -> Image.Image:
-    """Remove green background (#00FF00 or similar) and make transparent.
+def update_manifest(manifest_path: Path, asset_name: str, entry: dict):
+    """
+    Add or replace a single asset entry in a manifest (process-safe).
 
-    Tuned for Gemini's green/yellow-green backgrounds.
-    Based on build-spritesheet.py implementation.
+    Appends one JSON line to the manifest's journal instead of rewriting the
+    whole manifest.json, so each update is O(1) regardless of how many assets
+    the zone has. Call compact_manifest() to fold the journal back in.
     """
-    if not HAS_NUMPY:
-        print("Warning: numpy not available, cannot remove green background")
-        return img
+    record = json.dumps({"asset": asset_name, "entry": entry}) + "\n"
+    journal_path = journal_path_for(manifest_path)
+    with manifest_lock(manifest_path):
+        fd = os.open(journal_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, record.encode())
+        finally:
+            os.close(fd)
+
+
+# Per-process view of manifest.json + journal, so repeated reads only parse
+# journal lines appended since the last read
+_manifest_views = {}
+_manifest_views_lock = threading.Lock()
+
+
+def read_manifest(manifest_path: Path) -> dict:
+    """
+    Return the current manifest: manifest.json with its journal replayed.
+
+    The returned dict is shared between calls; treat it as read-only.
+    """
+    journal_path = journal_path_for(manifest_path)
+    with _manifest_views_lock, manifest_lock(manifest_path):
+        json_stat = manifest_path.stat() if manifest_path.exists() else None
+        json_sig = (json_stat.st_mtime_ns, json_stat.st_size) if json_stat else None
+        journal_size = journal_path.stat().st_size if journal_path.exists() else 0
+
+        view = _manifest_views.get(manifest_path)
+        if view is None or view["json_sig"] != json_sig or journal_size < view["offset"]:
+            # First read, or compacted since - start over from manifest.json
+            view = {"json_sig": json_sig, "offset": 0, "manifest": load_manifest(manifest_path)}
+            _manifest_views[manifest_path] = view
+
+        if journal_size > view["offset"]:
+            with open(journal_path, "rb") as f:
+                f.seek(view["offset"])
+                data = f.read(journal_size - view["offset"])
+            for line in data.splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    view["manifest"]["assets"][record["asset"]] = record["entry"]
+            view["offset"] = journal_size
+
+        return view["manifest"]
+
+
+def compact_manifest(manifest_path: Path) -> int:
+    """
+    Fold a manifest's journal into manifest.json and clear the journal.
+
+    Keeps manifest.json in the shape existing readers expect. Returns the
+    number of journal records that were folded in.
+    """
+    journal_path = journal_path_for(manifest_path)
+    with manifest_lock(manifest_path):
+        if not journal_path.exists():
+            return 0
+        manifest = load_manifest(manifest_path)
+        count = 0
+        with open(journal_path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    manifest["assets"][record["asset"]] = record["entry"]
+                    count += 1
+        # Write the new manifest before dropping the journal so a crash in
+        # between only means replaying records that are already applied
+        save_manifest(manifest_path, manifest)
+        journal_path.unlink()
+    return count
+
+
+def compact_all_manifests() -> int:
+    """Compact every manifest journal under each asset type's originals folder."""
+    total = 0
+    for config in ASSET_TYPES.values():
+        base = config["originals_base"]
+        if not base.exists():
+            continue
+        for journal_path in base.rglob("manifest.jsonl"):
+            count = compact_manifest(journal_path.with_suffix(".json"))
+            if count:
+                print(f"Compacted {count} manifest record{'s' if count != 1 else ''} into "
+                      f"{journal_path.with_suffix('.json').relative_to(PROJECT_ROOT)}")
+            total += count
+    return total
+
+
+def hash_file(path: Path) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(parent_key: str, stage: str, params: dict) -> str:
+    """Cache key for a stage's output: hash of (input key, stage, params)."""
+    payload = json.dumps([STAGE_CACHE_VERSION, parent_key, stage, params], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def watermark_stage_key(source_hash: str, watermark_size: int,
+                        threshold: float = WATERMARK_PRESENCE_THRESHOLD) -> str:
+    """Stage key for watermark removal of an input with the given content hash.
+
+    The presence threshold is part of the key: it decides whether the stage
+    inpaints or passes the image through, and later stages chain off it.
+    """
+    return stage_key(source_hash, "watermark", {
+        "size": watermark_size,
+        "method": "lama" if HAS_LAMA else "inpaint",
+        "threshold": threshold,
+    })
+
+
+def watermark_detect_key(source_hash: str, watermark_size: int) -> str:
+    """Key for the find_watermark() result of an input (see load_cached_detection)."""
+    return stage_key(source_hash, "watermark-detect", {"size": watermark_size})
+
+
+def _stage_cache_path(key: str, suffix: str = ".png") -> Path:
+    return STAGE_CACHE_DIR / key[:2] / f"{key}{suffix}"
+
+
+def load_cached_detection(key: str):
+    """Return a cached find_watermark() result as a tuple, or None."""
+    path = _stage_cache_path(key, ".json")
+    try:
+        found = tuple(json.loads(path.read_text()))
+        os.utime(path)
+    except (OSError, ValueError, TypeError):
+        return None
+    return found
+
+
+def save_cached_detection(key: str, found):
+    """Store a find_watermark() result, so cache hits (and the batch prefill's
+    later main pass) don't decode the image and correlate again."""
+    path = _stage_cache_path(key, ".json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(json.dumps(list(found)))
+    os.replace(tmp_path, path)
+
+
+def load_cached_stage(key: str):
+    """Return the cached output image for a stage key, or None."""
+    path = _stage_cache_path(key)
+    if not path.exists():
+        return None
+    try:
+        img = Image.open(path)
+        img.load()
+    except OSError:
+        # Truncated/corrupt entry - recompute it
+        return None
+    try:
+        # Mark as recently used for prune_stage_cache
+        os.utime(path)
+    except OSError:
+        pass
+    return img
+
+
+def save_cached_stage(key: str, img: Image.Image):
+    """Store a stage output; written to a temp file first so readers never see half a PNG."""
+    path = _stage_cache_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+    img.save(tmp_path, format="PNG", compress_level=1, compress_type=zlib.Z_RLE)
+    os.replace(tmp_path, path)
+
+
+_prune_lock = threading.Lock()
+
+
+def prune_stage_cache(max_mb: float = STAGE_CACHE_MAX_MB) -> int:
+    """Delete least-recently-used stage outputs until the cache fits in max_mb.
+
+    Recency is the file mtime, which load_cached_stage bumps on every hit.
+    Returns the number of entries removed.
+    """
+    if not _prune_lock.acquire(blocking=False):
+        return 0  # another thread is already pruning
+    try:
+        entries = []
+        for path in STAGE_CACHE_DIR.glob("*/*"):
+            if path.suffix not in (".png", ".json"):
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        max_bytes = int(max_mb * 1024 * 1024)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+    finally:
+        _prune_lock.release()
+
+
+def png_settings(preset: str = "default", compress_level: int = None,
+                 strategy: str = None, optimize: bool = None) -> dict:
+    """Build PNG encoder settings from a preset plus optional overrides."""
+    if preset not in PNG_PRESETS:
+        raise ValueError(f"Unknown PNG preset: {preset}. Available: {list(PNG_PRESETS.keys())}")
+    settings = dict(PNG_PRESETS[preset])
+    if compress_level is not None:
+        settings["compress_level"] = compress_level
+    if strategy is not None:
+        settings["strategy"] = strategy
+    if optimize is not None:
+        settings["optimize"] = optimize
+    return settings
+
+
+def save_image(img: Image.Image, path: Path, png: dict = None):
+    """
+    Save an image, using the given PNG encoder settings for .png paths.
+
+    Writes to a temp file and renames it into place, which also breaks any
+    hard link left by link_or_copy() instead of writing through it.
+    """
+    png = png or PNG_PRESETS["default"]
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        if path.suffix.lower() == ".png":
+            img.save(
+                tmp_path,
+                format="PNG",
+                compress_level=png["compress_level"],
+                compress_type=PNG_STRATEGIES[png["strategy"]],
+                optimize=png["optimize"],
+            )
+        else:
+            img.save(tmp_path, format=Image.registered_extensions()[path.suffix.lower()], quality=95)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def link_or_copy(src: Path, dst: Path) -> str:
+    """
+    Make dst a copy of src without re-encoding it.
+
+    Tries a reflink (copy-on-write clone, Linux btrfs/XFS), then a hard link,
+    then a plain copy. Returns which method was used.
+    """
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+
+    if fcntl and hasattr(fcntl, "ioctl") and sys.platform.startswith("linux"):
+        FICLONE = 0x40049409
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return "reflink"
+        except OSError:
+            dst.unlink()
+
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        shutil.copyfile(src, dst)
+        return "copy"
+
+
+class StageTimer:
+    """
+    Records wall time for each stage of one process_image call.
+
+    With trace_memory, also records how far traced memory peaked above its
+    level at the start of each stage (tracemalloc).
+    tracemalloc is process-wide, so peaks are only per-file accurate when a
+    process handles one file at a time (batch workers, not watch threads).
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages = []
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = {"stage": name, "ms": round((time.perf_counter() - start) * 1000, 2)}
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                entry["peakMB"] = round(peak / (1024 * 1024), 1)
+            self.stages.append(entry)
+
+    @property
+    def total_ms(self) -> float:
+        return round(sum(s["ms"] for s in self.stages), 2)
 
-    img = img.convert("RGBA")
-    data = np.array(img, dtype=np.float32)
 
-    r, g, b, a = data[:,:,0], data[:,:,1], data[:,:,2], data[:,:,3]
+_timings_log_lock = threading.Lock()
 
-    # Detect green-ish background: green is highest channel, blue is low
-    # This catches both pure green AND yellow-green backgrounds
-    is_green_dominant = (g > r) & (g > b) & (b < 100)
 
-    # Background pixels are bright and green-dominant
-    is_background = is_green_dominant & (g > 150)
+def log_timings(result: dict, log_path: Path = None):
+    """Append one file's stage timings to the JSON-lines timings log."""
+    if "stages" not in result:
+        return
+    log_path = log_path or TIMINGS_LOG
+    record = {
+        "file": result.get("file") or Path(result["final"]).name,
+        "time": datetime.now().isoformat(),
+        "skipped": result.get("skipped", False),
+        "totalMs": result.get("totalMs"),
+        "stages": result["stages"],
+    }
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with _timings_log_lock, open(log_path, "a") as f:
+        f.write(json.dumps(record) + "\n")
 
-    # For edge detection, calculate how "green" each pixel is
-    green_ratio = np.where(g > 0, g / (r + b + 1), 0)
 
-    # Soft edges: pixels that are somewhat green get partial transparency
-    edge_greenness = np.clip((green_ratio - 0.8) / 0.7, 0, 1)
+def print_stage_summary(results: list):
+    """Print per-stage totals/means/maxima across a batch or watch session."""
+    per_stage = {}
+    for r in results:
+        for entry in r.get("stages", []):
+            per_stage.setdefault(entry["stage"], []).append(entry)
+
+    if not per_stage:
+        return
 
-    # Combine: definite background = 0 alpha, edges = partial alpha
-    alpha_factor = np.where(is_background, 0, 1 - edge_greenness * 0.8)
+    print(f"\nStage timings ({len(results)} file{'s' if len(results) != 1 else ''}):")
+    print(f"  {'stage':<22} {'count':>5} {'total':>10} {'mean':>10} {'max':>10} {'peak MB':>8}")
+    for name, entries in per_stage.items():
+        times = [e["ms"] for e in entries]
+        peaks = [e["peakMB"] for e in entries if "peakMB" in e]
+        peak = f"{max(peaks):>8.1f}" if peaks else f"{'-':>8}"
+        print(f"  {name:<22} {len(times):>5} {sum(times) / 1000:>9.2f}s "
+              f"{sum(times) / len(times):>8.1f}ms {max(times):>8.1f}ms {peak}")
 
-    # Also catch any pixel where green significantly exceeds other channels
-    strong_green = (g > 180) & (g > r + 30) & (g > b + 100)
-    alpha_factor = np.where(strong_green, 0, alpha_factor)
 
-    # Apply alpha
-    new_alpha = (alpha_factor * 255).astype(np.uint8)
+def profiled_process_image(profile_dir: Path = None, **kwargs) -> dict:
+    """Run process_image, under cProfile with stats dumped per file if profile_dir is set.
+
+    Inspect with: python -m pstats <file>.prof
+    """
+    if not profile_dir:
+        return process_image(**kwargs)
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(process_image, **kwargs)
+    finally:
+        profile_dir = Path(profile_dir)
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        out_path = profile_dir / f"{Path(kwargs['input_path']).stem}_{get_timestamp()}.prof"
+        profiler.dump_stats(out_path)
+        print(f"        Profile: {out_path}")
 
-    # For semi-transparent edge pixels, reduce green tint (defringe)
-    edge_mask = (new_alpha > 0) & (new_alpha < 240)
-    if np.any(edge_mask):
-        g_adjusted = np.where(edge_mask, np.minimum(g, (r + b) / 2 * 1.2), g)
-        data[:,:,1] = g_adjusted
 
-    # Rebuild image with new alpha
-    result = np.stack([
-        data[:,:,0].astype(np.uint8),
-        data[:,:,1].astype(np.uint8),
-        data[:,:,2].astype(np.uint8),
-        new_alpha
-    ], axis=2)
+def remove_watermark(img: Image.Image, size: int = 60, location=None) -> Image.Image:
+    """Remove Gemini watermark using best available method.
 
-    return Image.fromarray(result)
+    location is the (center_x, center_y, mask_size) from find_watermark, if
+    already known.
+    """
+    if HAS_LAMA:
+        return remove_watermark_lama(img, size, location=location)
+    else:
+        return remove_watermark_inpaint(img, size, location=location)
+
+
+def resize_image(img: Image.Image, size_str: str) -> Image.Image:
+    """Resize image to target dimensions (WxH format)."""
+    width, height = map(int, size_str.lower().split("x"))
+    return resize_exact(img, (width, height))
+
+
+def remove_green_background(img: Image.Image, band_height: int = DEFAULT_BAND_HEIGHT) -> Image.Image:
+    """Remove green background (#00FF00 or similar) and make transparent.
+
+    Tuned for Gemini's green/yellow-green backgrounds. Uses the shared
+    lookup-table kernel in image_ops (same output as build-spritesheet.py),
+    keyed band_height rows at a time.
+    """
+    if not HAS_NUMPY:
+        print("Warning: numpy not available, cannot remove green background")
+        return img
+
+    return green_key(img, band_height)
 
 
 def remove_background_ai(img: Image.Image) -> Image.Image:
@@ -200,6 +670,8 @@ def remove_background_ai(img: Image.Image) -> Image.Image:
         print("Warning: rembg not available. Install with: pip install rembg")
         return img
 
+    from rembg import remove as rembg_remove
+
     # rembg works best with RGBA
     if img.mode != "RGBA":
         img = img.convert("RGBA")
@@ -216,10 +688,18 @@ def process_image(
     resize: str = None,
     watermark_size: int = 60,
     skip_watermark: bool = False,
+    watermark_threshold: float = WATERMARK_PRESENCE_THRESHOLD,
     green_bg: bool = False,
     remove_bg: bool = False,
     prompt: str = None,
     notes: str = None,
+    force: bool = False,
+    use_cache: bool = True,
+    png: dict = None,
+    trace_memory: bool = False,
+    band_height: int = DEFAULT_BAND_HEIGHT,
+    formats: list = None,
+    widths: list = None,
     # Phase 2 params (ignored for now)
     slot: str = None,
     cosmetic_id: str = None,
@@ -227,6 +707,36 @@ def process_image(
     """
     Process a single image through the ingestion pipeline.
 
+    Expensive stage outputs (watermark removal, background removal) are
+    memoized in the stage cache under (input content hash, stage, params),
+    so a re-run with different downstream options reuses the upstream work.
+    If the manifest shows the same input was already ingested with the same
+    parameters the image is skipped outright (unless force is set).
+
+    png holds the PNG encoder settings (see png_settings()). Without a resize
+    the final file is a reflink/hard link of the _processed/ file rather than
+    a second encode of the same pixels.
+
+    Every stage is timed (see StageTimer); the result's "stages" list holds
+    the per-stage timings, with tracemalloc peaks if trace_memory is set.
+
+    Before inpainting, the corner is checked for the Gemini star
+    (watermark_present); if it scores below watermark_threshold the image
+    is passed through untouched. The score and the skip are recorded in the
+    manifest. A threshold of 0 always inpaints. The detection is cached by
+    content hash too, and pixels are only decoded when a stage has to run,
+    so a fully cached image skips both the decode and the detection.
+
+    band_height bounds the chroma key's working memory (rows per band, None
+    for whole-frame); it doesn't change the output, so it isn't part of the
+    cache keys.
+
+    formats (e.g. ["webp", "avif"]) adds web-format derivatives of the final
+    asset next to it (see derivatives.py); the ones smaller than the PNG are
+    recorded under "variants" in the manifest. widths (e.g. [480, 960])
+    writes name-<w>w.png downscales (plus their format derivatives) next to
+    it and records them under "srcset".
+
     Returns dict with processing results.
     """
     if asset_type not in ASSET_TYPES:
@@ -261,120 +771,386 @@ def process_image(
         final_name = input_path.name
 
     base_name = Path(final_name).stem
+    manifest_path = originals_dir / "manifest.json"
+
+    timer = StageTimer(trace_memory)
+
+    # Stage keys only depend on the input bytes and stage parameters, so the
+    # whole chain can be derived before touching any pixels
+    with timer.stage("hash"):
+        source_hash = hash_file(input_path)
+    watermark_key = source_hash
+    if not skip_watermark:
+        watermark_key = watermark_stage_key(source_hash, watermark_size, watermark_threshold)
+        detect_key = watermark_detect_key(source_hash, watermark_size)
+    background_key = watermark_key
+    if green_bg:
+        background_key = stage_key(watermark_key, "background", {"mode": "green"})
+    elif remove_bg:
+        background_key = stage_key(watermark_key, "background", {"mode": "ai"})
+    png = png or png_settings()
+    final_params = {"size": resize, "png": png}
+    if formats:
+        final_params["formats"] = sorted(formats)
+    if widths:
+        final_params["widths"] = sorted(widths)
+    pipeline_hash = stage_key(background_key, "resize", final_params)
+
+    final_path = final_dir / final_name
+    processed_path = processed_dir / final_name
+
+    # Unchanged input + unchanged parameters: nothing to do
+    if not force and final_path.exists():
+        with timer.stage("skip-check"):
+            previous = read_manifest(manifest_path)["assets"].get(final_name, {})
+        if previous.get("sourceHash") == source_hash and previous.get("pipelineHash") == pipeline_hash:
+            print(f"  Unchanged since last ingest, skipping: {final_path.relative_to(THEMES_DIR)}")
+            return {
+                "success": True,
+                "skipped": True,
+                "original": str(originals_dir / previous.get("original", "")),
+                "processed": str(processed_path),
+                "final": str(final_path),
+                "stages": timer.stages,
+                "totalMs": timer.total_ms,
+            }
+
     timestamp = get_timestamp()
 
     # Step 1: Copy original to _originals with timestamp
     original_name = f"{base_name}_{timestamp}.png"
     original_path = originals_dir / original_name
-    shutil.copy2(input_path, original_path)
+    with timer.stage("archive"):
+        shutil.copy2(input_path, original_path)
     print(f"  [1/3] Archived original: {original_path.relative_to(THEMES_DIR)}")
 
-    # Step 2: Load and process image
-    img = Image.open(input_path)
-    original_size = f"{img.width}x{img.height}"
+    # Step 2: Load and process image. Only the header is read here; pixels
+    # are decoded when a stage actually needs them (not for cache hits).
+    source = Image.open(input_path)
+    original_size = f"{source.width}x{source.height}"
+    img = None
 
-    if img.mode != "RGB":
-        img = img.convert("RGB")
+    def decoded() -> Image.Image:
+        with timer.stage("decode"):
+            source.load()
+            return source if source.mode == "RGB" else source.convert("RGB")
 
     # Count total steps for progress display
     total_steps = 3
     if green_bg or remove_bg:
         total_steps = 4
     step = 2
+    cached_stages = []
 
-    # Remove watermark
+    # Remove watermark, unless the corner shows no sign of one
+    watermark_skipped = False
+    watermark_score = None
     if not skip_watermark:
-        print(f"  [{step}/{total_steps}] Removing watermark...")
-        img = remove_watermark(img, watermark_size)
+        found = load_cached_detection(detect_key) if use_cache else None
+        if found is None:
+            img = decoded()
+            with timer.stage("watermark-check"):
+                found = find_watermark(img, watermark_size)
+                if found is not None and use_cache:
+                    save_cached_detection(detect_key, found)
+        present, watermark_score = watermark_present(img, watermark_threshold, found)
+        if not present:
+            print(f"  [{step}/{total_steps}] No watermark found (score {watermark_score:.2f}), "
+                  f"skipping inpainting")
+            watermark_skipped = True
+        else:
+            with timer.stage("watermark-cache"):
+                cached = load_cached_stage(watermark_key) if use_cache else None
+            if cached:
+                print(f"  [{step}/{total_steps}] Removing watermark... (cached)")
+                img = cached
+                cached_stages.append("watermark")
+            else:
+                print(f"  [{step}/{total_steps}] Removing watermark...")
+                if img is None:
+                    img = decoded()
+                with timer.stage("watermark"):
+                    img = remove_watermark(img, watermark_size, found and found[:3])
+                if use_cache:
+                    with timer.stage("watermark-cache-write"):
+                        save_cached_stage(watermark_key, img)
     else:
         print(f"  [{step}/{total_steps}] Skipping watermark removal")
     step += 1
+    if img is None:
+        img = decoded()
 
     # Remove background if requested
-    bg_removed = False
-    if green_bg:
-        print(f"  [{step}/{total_steps}] Removing green background...")
-        img = remove_green_background(img)
-        bg_removed = True
-        step += 1
-    elif remove_bg:
-        print(f"  [{step}/{total_steps}] Removing background (AI)...")
-        img = remove_background_ai(img)
-        bg_removed = True
+    if green_bg or remove_bg:
+        label = "green background" if green_bg else "background (AI)"
+        with timer.stage("background-cache"):
+            cached = load_cached_stage(background_key) if use_cache else None
+        if cached:
+            print(f"  [{step}/{total_steps}] Removing {label}... (cached)")
+            img = cached
+            cached_stages.append("background")
+        else:
+            print(f"  [{step}/{total_steps}] Removing {label}...")
+            with timer.stage("chroma-key" if green_bg else "rembg"):
+                img = remove_green_background(img, band_height) if green_bg else remove_background_ai(img)
+            if use_cache:
+                with timer.stage("background-cache-write"):
+                    save_cached_stage(background_key, img)
         step += 1
 
     # Save to _processed
-    processed_path = processed_dir / final_name
-    if bg_removed or (img.mode == "RGBA"):
-        img.save(processed_path)  # PNG for transparency
-    else:
-        img.save(processed_path, quality=95)
+    with timer.stage("encode"):
+        save_image(img, processed_path, png)
     print(f"        Saved processed: {processed_path.relative_to(THEMES_DIR)}")
 
     # Final step: Resize if requested and save to final location
+    # (resize is cheaper to redo than to round-trip through the stage cache)
     if resize:
-        img = resize_image(img, resize)
+        with timer.stage("resize"):
+            img = resize_image(img, resize)
         print(f"  [{step}/{total_steps}] Resized to {resize}")
-
-    final_path = final_dir / final_name
-    if bg_removed or (img.mode == "RGBA"):
-        img.save(final_path)  # PNG for transparency
+        with timer.stage("encode-final"):
+            save_image(img, final_path, png)
+        print(f"        Saved final: {final_path.relative_to(THEMES_DIR)}")
     else:
-        img.save(final_path, quality=95)
+        # Same pixels as _processed - don't encode them twice
+        with timer.stage("link-final"):
+            method = link_or_copy(processed_path, final_path)
+        print(f"        Saved final ({method}): {final_path.relative_to(THEMES_DIR)}")
     final_size = f"{img.width}x{img.height}"
-    print(f"        Saved final: {final_path.relative_to(THEMES_DIR)}")
 
-    # Step 4: Update manifest
-    manifest_path = originals_dir / "manifest.json"
-    manifest = load_manifest(manifest_path)
-
-    manifest["assets"][final_name] = {
-        "original": original_name,
-        "processed": str(processed_path.relative_to(config["processed_base"])),
-        "final": str(final_path.relative_to(config["final_base"])),
-        "dimensions": {
-            "original": original_size,
-            "final": final_size,
-        },
-        "generated": datetime.now().isoformat(),
-        "watermarkRemoved": not skip_watermark,
-        "backgroundRemoved": "green" if green_bg else ("ai" if remove_bg else None),
-        "prompt": prompt,
-        "notes": notes,
-    }
+    variants = None
+    if formats:
+        with timer.stage("derivatives"):
+            variants = encode_derivatives(img, final_path, formats)
+        sizes = ", ".join(f"{fmt} {v['bytes'] // 1024} KB" for fmt, v in variants.items())
+        print(f"        Derivatives: {sizes}")
+    elif remove_derivatives(final_path):
+        # Derivatives from an earlier ingest with --formats
+        print(f"        Removed stale derivatives")
+
+    srcset = None
+    if widths:
+        with timer.stage("pyramid"):
+            srcset = write_pyramid(img, final_path, widths, formats or [],
+                                   save=lambda resized, path: save_image(resized, path, png))
+        sizes = ", ".join(f"{size['width']}w" for size in srcset)
+        print(f"        Responsive sizes: {sizes}")
+    elif remove_pyramid(final_path):
+        # Sizes from an earlier ingest with --widths
+        print(f"        Removed stale responsive sizes")
 
-    save_manifest(manifest_path, manifest)
+    # Step 4: Update manifest
+    with timer.stage("manifest"):
+        update_manifest(manifest_path, final_name, {
+            "original": original_name,
+            "processed": str(processed_path.relative_to(config["processed_base"])),
+            "final": str(final_path.relative_to(config["final_base"])),
+            "dimensions": {
+                "original": original_size,
+                "final": final_size,
+            },
+            "generated": datetime.now().isoformat(),
+            "watermarkRemoved": not skip_watermark and not watermark_skipped,
+            "watermarkSkipped": watermark_skipped,
+            "watermarkScore": None if watermark_score is None else round(watermark_score, 3),
+            "backgroundRemoved": "green" if green_bg else ("ai" if remove_bg else None),
+            "sourceHash": source_hash,
+            "pipelineHash": pipeline_hash,
+            "variants": variants,
+            "srcset": srcset,
+            "prompt": prompt,
+            "notes": notes,
+        })
     print(f"        Updated manifest")
 
     return {
         "success": True,
+        "skipped": False,
+        "cachedStages": cached_stages,
+        "watermarkSkipped": watermark_skipped,
+        "watermarkScore": watermark_score,
         "original": str(original_path),
         "processed": str(processed_path),
         "final": str(final_path),
+        "stages": timer.stages,
+        "totalMs": timer.total_ms,
     }
 
 
+ZONES = ["lobby", "arcade", "records"]
+
+
+# Last 12 bytes of every complete PNG: the empty IEND chunk and its CRC
+PNG_IEND = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+DEFAULT_SETTLE_TIME = 0.3
+
+
+def png_complete(path: Path) -> bool:
+    """True if the file ends with PNG's IEND chunk, i.e. the writer has finished it."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(-len(PNG_IEND), os.SEEK_END)
+            return f.read() == PNG_IEND
+    except OSError:
+        return False
+
+
+class StableFileTracker:
+    """
+    Tracks candidate files until their size and mtime stop changing.
+
+    The image tool may still be writing a file when it first shows up, so a
+    file is only handed out once its (size, mtime) has been unchanged for
+    settle_time seconds. Safe to feed from the watchdog observer thread.
+    """
+
+    def __init__(self, settle_time: float = DEFAULT_SETTLE_TIME):
+        self.settle_time = settle_time
+        self._pending = {}  # path -> (size, mtime_ns, first seen with that signature)
+        self._lock = threading.Lock()
+
+    def add(self, path: Path):
+        with self._lock:
+            self._pending.setdefault(path, None)
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._pending)
+
+    def pop_stable(self) -> list:
+        """Return (and forget) files whose size and mtime have settled."""
+        now = time.monotonic()
+        stable = []
+        with self._lock:
+            for path, seen in list(self._pending.items()):
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    # Renamed or deleted before it settled
+                    del self._pending[path]
+                    continue
+
+                signature = (st.st_size, st.st_mtime_ns)
+                if seen is None or seen[:2] != signature:
+                    self._pending[path] = (*signature, now)
+                elif st.st_size > 0 and now - seen[2] >= self.settle_time:
+                    stable.append(path)
+                    del self._pending[path]
+        return stable
+
+
+if HAS_WATCHDOG:
+    class _IncomingHandler(FileSystemEventHandler):
+        """Feeds *.png create/modify/move events into a StableFileTracker."""
+
+        def __init__(self, tracker: StableFileTracker, wake: threading.Event):
+            self.tracker = tracker
+            self.wake = wake
+
+        def _note(self, path: str):
+            path = Path(path)
+            if path.suffix.lower() == ".png" and path.parent == INCOMING_DIR:
+                self.tracker.add(path)
+                self.wake.set()
+
+        def on_created(self, event):
+            if not event.is_directory:
+                self._note(event.src_path)
+
+        def on_modified(self, event):
+            if not event.is_directory:
+                self._note(event.src_path)
+
+        def on_moved(self, event):
+            if not event.is_directory:
+                self._note(event.dest_path)
+
+
+def _ingest_incoming(img_path: Path, options: dict) -> dict:
+    """Process one file from incoming/ and move it to incoming/_done/."""
+    try:
+        result = profiled_process_image(input_path=img_path, asset_type="theme", **options)
+        result["file"] = img_path.name
+
+        if result["success"]:
+            # Move processed file to avoid reprocessing
+            done_dir = INCOMING_DIR / "_done"
+            done_dir.mkdir(exist_ok=True)
+            shutil.move(str(img_path), str(done_dir / img_path.name))
+            print(f"Moved {img_path.name} to incoming/_done/")
+        return result
+
+    except Exception as e:
+        print(f"Error processing {img_path.name}: {e}")
+        return {"file": img_path.name, "success": False, "error": str(e)}
+
+
 def watch_incoming(
     theme: str = "default",
     zone: str = None,
     resize: str = None,
     poll_interval: float = 2.0,
+    warm_up: bool = True,
+    workers: int = 2,
+    queue_size: int = 8,
+    settle_time: float = DEFAULT_SETTLE_TIME,
+    use_polling: bool = False,
+    png: dict = None,
+    profile_dir: Path = None,
+    trace_memory: bool = False,
+    timings_log: Path = None,
+    band_height: int = DEFAULT_BAND_HEIGHT,
+    formats: list = None,
+    widths: list = None,
+    cache_max_mb: float = STAGE_CACHE_MAX_MB,
 ):
     """
     Watch the incoming/ folder for new images and process them.
 
     Zone is inferred from filename pattern: {zone}-{name}.png
     Or can be set explicitly with --zone flag.
+
+    New files are picked up from filesystem events (watchdog: inotify on
+    Linux, ReadDirectoryChangesW on Windows), falling back to re-globbing
+    every poll_interval seconds when watchdog isn't installed or
+    use_polling is set. A file is only dispatched once its size and mtime
+    have been stable for settle_time and, for PNGs, it ends in an IEND
+    chunk (a writer that pauses longer than settle_time mid-file isn't
+    picked up half-written); it is then handed to a bounded queue drained
+    by `workers` threads so a burst of drops is processed concurrently.
+    A file that fails is retried once it changes again.
+
+    The LaMa model is loaded up front (warm_up) so the first drop is handled
+    as quickly as the rest; without warm_up it is loaded by the first image
+    that actually needs inpainting, so sessions that only hit the cache or
+    skip clean images never import torch. PNGs are encoded with the "fast" preset unless
+    png settings are given.
+
+    Stage timings for each file go to the timings log, and a per-stage
+    summary is printed when the session ends. The stage cache is pruned to
+    cache_max_mb after each file.
     """
+    png = png or png_settings("fast")
+    event_driven = HAS_WATCHDOG and not use_polling
+
     print(f"\nWatching {INCOMING_DIR} for new images...")
     print(f"Default theme: {theme}")
     print(f"Default zone: {zone or '(inferred from filename)'}")
     print(f"Resize: {resize or '(none)'}")
+    print(f"Mode: {'filesystem events' if event_driven else f'polling every {poll_interval}s'}, "
+          f"{workers} worker{'s' if workers != 1 else ''}")
     print("\nDrop files like: lobby-background.png, arcade-cabinet.png")
     print("Or with explicit zone: just name the file and use --zone\n")
     print("Press Ctrl+C to stop.\n")
 
+    if warm_up and warm_up_lama():
+        print("LaMa model ready.\n")
+
     processed_files = set()
+    # name -> (size, mtime_ns) of files that failed; retried once they change
+    failed_files = {}
 
     # Load already-processed files
     if INCOMING_DIR.exists():
@@ -383,58 +1159,292 @@ def watch_incoming(
 
     INCOMING_DIR.mkdir(parents=True, exist_ok=True)
 
+    # Bounded queue: if workers fall behind, dispatch blocks instead of
+    # piling up decoded work in memory
+    work_queue = queue.Queue(maxsize=queue_size)
+    session_results = []
+
+    def worker():
+        while True:
+            job = work_queue.get()
+            try:
+                if job is None:
+                    return
+                result = _ingest_incoming(*job)
+                if not result.get("success"):
+                    img_path = job[0]
+                    try:
+                        st = img_path.stat()
+                        failed_files[img_path.name] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        pass
+                    # Let the next modify event (or poll) requeue it
+                    processed_files.discard(img_path.name)
+                log_timings(result, timings_log)
+                session_results.append(result)
+                prune_stage_cache(cache_max_mb)
+            finally:
+                work_queue.task_done()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, workers))]
+    for t in threads:
+        t.start()
+
+    tracker = StableFileTracker(settle_time)
+    wake = threading.Event()
+    observer = None
+    if event_driven:
+        observer = Observer()
+        observer.schedule(_IncomingHandler(tracker, wake), str(INCOMING_DIR), recursive=False)
+        observer.start()
+
+    # How often to re-check files that are still settling
+    settle_poll = min(0.1, settle_time)
+
+    def dispatch(img_path: Path):
+        try:
+            st = img_path.stat()
+        except OSError:
+            return
+        if failed_files.get(img_path.name) == (st.st_size, st.st_mtime_ns):
+            return  # failed before and unchanged since
+        if not png_complete(img_path):
+            # Writer paused past settle_time; the next change re-adds it
+            print(f"Still being written (no IEND yet), waiting: {img_path.name}")
+            return
+        failed_files.pop(img_path.name, None)
+
+        print(f"\n{'='*50}")
+        print(f"New file: {img_path.name}")
+        processed_files.add(img_path.name)
+
+        # Infer zone from filename if not set
+        inferred_zone = zone
+        output_name = img_path.stem
+
+        if not inferred_zone:
+            # Try to parse zone from filename: {zone}-{rest}.png
+            parts = img_path.stem.split("-", 1)
+            if len(parts) == 2 and parts[0] in ZONES:
+                inferred_zone = parts[0]
+                output_name = parts[1]
+                print(f"Inferred zone: {inferred_zone}")
+            else:
+                print(f"Could not infer zone from filename.")
+                print(f"Rename to {{zone}}-{{name}}.png or restart with --zone")
+                return
+
+        work_queue.put((img_path, {
+            "theme": theme,
+            "zone": inferred_zone,
+            "output_name": output_name,
+            "resize": resize,
+            "png": png,
+            "profile_dir": profile_dir,
+            "trace_memory": trace_memory,
+            "band_height": band_height,
+            "formats": formats,
+            "widths": widths,
+        }))
+
     try:
         while True:
-            for img_path in INCOMING_DIR.glob("*.png"):
-                if img_path.name in processed_files:
-                    continue
+            if event_driven:
+                # Sleep until an event arrives; only tick while files are settling
+                wake.wait(timeout=settle_poll if tracker.has_pending() else 60)
+                wake.clear()
+            else:
+                for img_path in INCOMING_DIR.glob("*.png"):
+                    if img_path.name not in processed_files:
+                        tracker.add(img_path)
+
+            for img_path in tracker.pop_stable():
+                if img_path.name not in processed_files:
+                    dispatch(img_path)
+
+            if not event_driven:
+                time.sleep(settle_poll if tracker.has_pending() else poll_interval)
 
-                print(f"\n{'='*50}")
-                print(f"New file: {img_path.name}")
-
-                # Infer zone from filename if not set
-                inferred_zone = zone
-                output_name = img_path.stem
-
-                if not inferred_zone:
-                    # Try to parse zone from filename: {zone}-{rest}.png
-                    parts = img_path.stem.split("-", 1)
-                    if len(parts) == 2 and parts[0] in ["lobby", "arcade", "records"]:
-                        inferred_zone = parts[0]
-                        output_name = parts[1]
-                        print(f"Inferred zone: {inferred_zone}")
-                    else:
-                        print(f"Could not infer zone from filename.")
-                        print(f"Rename to {{zone}}-{{name}}.png or restart with --zone")
-                        processed_files.add(img_path.name)
-                        continue
+    except KeyboardInterrupt:
+        print("\n\nStopping... waiting for in-flight files to finish.")
+        if observer:
+            observer.stop()
+            observer.join()
+        for _ in threads:
+            work_queue.put(None)
+        for t in threads:
+            t.join()
+        compact_all_manifests()
+        print_stage_summary(session_results)
+        print_watermark_savings(session_results, timings_log)
+        print("Stopped watching.")
+
+
+def _ingest_one(path: Path, options: dict) -> dict:
+    """Run process_image for one batch file, capturing errors for the summary."""
+    print(f"\nProcessing: {path.name}")
+    try:
+        result = profiled_process_image(input_path=path, **options)
+        if result["success"]:
+            print(f"  Done! ({path.name})")
+        return {"file": path.name, **result}
+    except Exception as e:
+        print(f"  Error ({path.name}): {e}")
+        if "--debug" in sys.argv:
+            import traceback
+            traceback.print_exc()
+        return {"file": path.name, "success": False, "error": str(e)}
+
+
+def prefill_watermark_stage(paths: list, watermark_size: int = 60, batch_size: int = 8,
+                            threshold: float = WATERMARK_PRESENCE_THRESHOLD) -> int:
+    """
+    Run watermark removal for a batch up front, batching LaMa across images.
+
+    Corner tiles from batch_size images at a time go through one LaMa forward
+    pass (remove_watermark_lama_batch) and the results are written to the
+    stage cache, so the following process_image calls - serial or in the
+    worker pool - pick them up as cache hits. Inputs already in the cache,
+    or without a watermark (see watermark_present), are left alone. Each
+    detection is stored in the detection cache, so the main pass neither
+    decodes nor correlates these inputs again. Returns the number of images
+    inpainted.
+    """
+    if not HAS_LAMA:
+        print("LaMa not available; skipping batched watermark removal")
+        return 0
+
+    pending = []
+    for path in paths:
+        source_hash = hash_file(path)
+        key = watermark_stage_key(source_hash, watermark_size, threshold)
+        if not _stage_cache_path(key).exists():
+            pending.append((path, key, watermark_detect_key(source_hash, watermark_size)))
+
+    if not pending:
+        return 0
+
+    print(f"\nBatch-inpainting watermarks for {len(pending)} files ({batch_size} per pass)...")
+    inpainted = 0
+    for start in range(0, len(pending), batch_size):
+        chunk = []
+        for path, key, detect_key in pending[start:start + batch_size]:
+            found = load_cached_detection(detect_key)
+            if found is not None and not watermark_present(None, threshold, found)[0]:
+                continue
+            img = Image.open(path).convert("RGB")
+            if found is None:
+                found = find_watermark(img, watermark_size)
+                if found is not None:
+                    save_cached_detection(detect_key, found)
+            if watermark_present(img, threshold, found)[0]:
+                chunk.append((key, img, found and found[:3]))
+        if not chunk:
+            continue
+        images = [img for _, img, _ in chunk]
+        locations = [location for _, _, location in chunk]
+        cleaned = remove_watermark_lama_batch(images, watermark_size, batch_size, locations)
+        for (key, _, _), img in zip(chunk, cleaned):
+            save_cached_stage(key, img)
+        inpainted += len(chunk)
+    return inpainted
 
-                try:
-                    result = process_image(
-                        input_path=img_path,
-                        asset_type="theme",
-                        theme=theme,
-                        zone=inferred_zone,
-                        output_name=output_name,
-                        resize=resize,
-                    )
 
-                    if result["success"]:
-                        # Move processed file to avoid reprocessing
-                        done_dir = INCOMING_DIR / "_done"
-                        done_dir.mkdir(exist_ok=True)
-                        shutil.move(str(img_path), str(done_dir / img_path.name))
-                        print(f"Moved to incoming/_done/")
+def ingest_batch(paths: list, options: dict, jobs: int = 1, warm_up: bool = False) -> list:
+    """
+    Process a batch of images, optionally spread over a process pool.
 
-                except Exception as e:
-                    print(f"Error processing {img_path.name}: {e}")
+    Each worker updates the zone manifest under a file lock, so workers that
+    finish at the same time can't overwrite each other's entries. The LaMa
+    model is loaded once per worker and reused for every file it handles;
+    with warm_up it is loaded as each worker starts.
 
-                processed_files.add(img_path.name)
+    Returns one result dict per file, in input order.
+    """
+    if jobs <= 1 or len(paths) <= 1:
+        if warm_up and not options.get("skip_watermark"):
+            warm_up_lama()
+        return [_ingest_one(path, options) for path in paths]
 
-            time.sleep(poll_interval)
+    # multiprocessing costs ~25ms to import; only parallel batches need it
+    from concurrent.futures import ProcessPoolExecutor, as_completed
 
-    except KeyboardInterrupt:
-        print("\n\nStopped watching.")
+    jobs = min(jobs, len(paths))
+    print(f"\nProcessing {len(paths)} files with {jobs} workers...")
+
+    initializer = warm_up_lama if warm_up and not options.get("skip_watermark") else None
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer) as pool:
+        futures = {pool.submit(_ingest_one, path, options): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                # Worker died (e.g. killed by the OOM killer)
+                results[path] = {"file": path.name, "success": False, "error": str(e)}
+
+    return [results[path] for path in paths]
+
+
+def mean_stage_ms(stage: str, results: list = (), log_path: Path = None, history: int = 200):
+    """Mean time of a stage across results, else across recent timings-log records.
+
+    Returns None if the stage hasn't run in either.
+    """
+    times = [e["ms"] for r in results for e in r.get("stages", []) if e["stage"] == stage]
+    if not times:
+        try:
+            lines = (log_path or TIMINGS_LOG).read_text().splitlines()[-history:]
+        except OSError:
+            lines = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            times += [e["ms"] for e in record.get("stages", []) if e.get("stage") == stage]
+    return sum(times) / len(times) if times else None
+
+
+def print_watermark_savings(results: list, log_path: Path = None):
+    """Report images whose inpainting was skipped and the time that saved.
+
+    The saving is estimated from the mean inpainting time in this run, or
+    from the timings log if nothing was inpainted.
+    """
+    skipped = sum(1 for r in results if r.get("watermarkSkipped"))
+    if not skipped:
+        return
+    inpaint_ms = mean_stage_ms("watermark", results, log_path)
+    if inpaint_ms is None:
+        print(f"  ({skipped} without a watermark, inpainting skipped)")
+    else:
+        print(f"  ({skipped} without a watermark, inpainting skipped: ~{skipped * inpaint_ms / 1000:.1f}s "
+              f"saved at {inpaint_ms:.0f}ms per inpaint)")
+
+
+def print_batch_summary(results: list, elapsed: float, jobs: int = 1, timings_log: Path = None):
+    """Print a per-file success/failure summary for a batch run."""
+    succeeded = [r for r in results if r.get("success")]
+    failed = [r for r in results if not r.get("success")]
+
+    print(f"\n{'='*50}")
+    print(f"Batch summary: {len(succeeded)} succeeded, {len(failed)} failed "
+          f"({len(results)} files, {jobs} worker{'s' if jobs != 1 else ''}, {elapsed:.1f}s)")
+    skipped = sum(1 for r in succeeded if r.get("skipped"))
+    if skipped:
+        print(f"  ({skipped} unchanged and skipped)")
+    print_watermark_savings(succeeded, timings_log)
+    for r in results:
+        if r.get("success"):
+            final = Path(r["final"]).relative_to(THEMES_DIR)
+            status = "SKIP" if r.get("skipped") else "OK  "
+            note = " (no watermark)" if r.get("watermarkSkipped") else ""
+            print(f"  {status}  {r['file']} -> {final}{note}")
+        else:
+            print(f"  FAIL  {r['file']}: {r.get('error', 'unknown error')}")
 
 
 def main():
@@ -454,6 +1464,9 @@ Examples:
 
   # Batch process
   python ingest-image.py *.png --theme default --zone arcade
+
+  # Batch process on 4 cores
+  python ingest-image.py *.png --theme default --zone arcade --jobs 4
         """
     )
 
@@ -469,12 +1482,60 @@ Examples:
                         help="Watermark detection area size (default: 60)")
     parser.add_argument("--skip-watermark", action="store_true",
                         help="Skip watermark removal")
+    parser.add_argument("--watermark-threshold", type=float, default=WATERMARK_PRESENCE_THRESHOLD,
+                        help="Skip inpainting when the watermark check scores below this "
+                             f"(0 = always inpaint, default: {WATERMARK_PRESENCE_THRESHOLD})")
     parser.add_argument("--green-bg", action="store_true",
                         help="Remove green background (#00FF00) - for sprites")
     parser.add_argument("--remove-bg", action="store_true",
                         help="Remove background using AI (rembg) - works on any background")
     parser.add_argument("--prompt", help="Generation prompt (stored in manifest)")
     parser.add_argument("--notes", help="Notes about this generation")
+    parser.add_argument("--force", action="store_true",
+                        help="Reprocess even if the input and options are unchanged")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="Don't read or write the per-stage result cache")
+    parser.add_argument("--cache-mb", type=float, default=STAGE_CACHE_MAX_MB,
+                        help=f"Prune the stage cache to this size after a run (default: {STAGE_CACHE_MAX_MB} MB)")
+    parser.add_argument("--png-preset", choices=list(PNG_PRESETS.keys()),
+                        help="PNG encoder preset (default: 'default', or 'fast' in watch mode)")
+    parser.add_argument("--compress-level", type=int, choices=range(0, 10), metavar="0-9",
+                        help="Override the preset's zlib compression level")
+    parser.add_argument("--png-strategy", choices=list(PNG_STRATEGIES.keys()),
+                        help="Override the preset's zlib strategy")
+    parser.add_argument("--optimize", action="store_true", default=None,
+                        help="Extra PNG optimize pass (slow, smaller files)")
+    parser.add_argument("--profile", nargs="?", const=CACHE_DIR / "profiles", type=Path,
+                        metavar="DIR", help="Dump cProfile stats per file (default dir: .cache/asset-pipeline/profiles)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Record tracemalloc peak memory per stage (slower)")
+    parser.add_argument("--timings-log", type=Path, default=TIMINGS_LOG,
+                        help="JSON-lines log for per-stage timings")
+    parser.add_argument("--band-height", type=int, default=DEFAULT_BAND_HEIGHT,
+                        help=f"Rows per band for the chroma key; 0 = whole image at once (default: {DEFAULT_BAND_HEIGHT})")
+    parser.add_argument("--formats", default="",
+                        help=f"Also write web-format derivatives of each final asset: "
+                             f"comma-separated {', '.join(DERIVATIVE_FORMATS)} (default: none)")
+    parser.add_argument("--widths", nargs="?", const=",".join(map(str, DEFAULT_WIDTHS)), default="",
+                        help="Also write name-<w>w.png downscales of each final asset at these widths "
+                             f"(default when given without a value: {','.join(map(str, DEFAULT_WIDTHS))})")
+    parser.add_argument("--compact-manifest", action="store_true",
+                        help="Fold pending manifest.jsonl journals into manifest.json and exit")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Worker processes for batch mode (0 = all cores, default: 1)")
+    parser.add_argument("--inpaint-batch", type=int, default=0, metavar="N",
+                        help="Batch mode: inpaint watermarks N images per LaMa pass before processing")
+    parser.add_argument("--warm-up", action="store_true", default=None,
+                        help="Load the LaMa model before the first image (default in watch mode)")
+    parser.add_argument("--no-warm-up", dest="warm_up", action="store_false",
+                        help="Watch mode: load LaMa on the first image that needs inpainting instead")
+    parser.add_argument("--watch-workers", type=int, default=2,
+                        help="Worker threads for watch mode (default: 2)")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_TIME,
+                        help="Watch mode: seconds a new file's size/mtime must hold still before it's "
+                             f"processed (default: {DEFAULT_SETTLE_TIME})")
+    parser.add_argument("--poll", action="store_true",
+                        help="Watch mode: poll incoming/ instead of using filesystem events")
 
     # Phase 2: cosmetic options (hidden for now)
     # parser.add_argument("--slot", help="Cosmetic slot (head, face, held, effect)")
@@ -482,11 +1543,41 @@ Examples:
 
     args = parser.parse_args()
 
+    if args.compact_manifest:
+        if not compact_all_manifests():
+            print("Nothing to compact.")
+        return
+
+    try:
+        formats = parse_formats(args.formats)
+        widths = parse_widths(args.widths)
+    except ValueError as e:
+        parser.error(str(e))
+
+    png = png_settings(
+        args.png_preset or ("fast" if args.watch else "default"),
+        compress_level=args.compress_level,
+        strategy=args.png_strategy,
+        optimize=args.optimize,
+    )
+
     if args.watch:
         watch_incoming(
             theme=args.theme,
             zone=args.zone,
             resize=args.resize,
+            workers=args.watch_workers,
+            use_polling=args.poll,
+            png=png,
+            profile_dir=args.profile,
+            trace_memory=args.trace_memory,
+            timings_log=args.timings_log,
+            band_height=args.band_height,
+            formats=formats,
+            widths=widths,
+            cache_max_mb=args.cache_mb,
+            settle_time=args.settle,
+            warm_up=args.warm_up is not False,
         )
         return
 
@@ -495,7 +1586,8 @@ Examples:
         print("\nError: No files specified. Use --watch or provide file paths.")
         sys.exit(1)
 
-    # Process each file
+    # Collect valid files
+    paths = []
     for file_path in args.files:
         path = Path(file_path)
         if not path.exists():
@@ -506,32 +1598,46 @@ Examples:
             print(f"Warning: Skipping non-image file: {path}")
             continue
 
-        print(f"\nProcessing: {path.name}")
-
-        try:
-            result = process_image(
-                input_path=path,
-                asset_type=args.asset_type,
-                theme=args.theme,
-                zone=args.zone,
-                output_name=args.output_name,
-                resize=args.resize,
-                watermark_size=args.watermark_size,
-                skip_watermark=args.skip_watermark,
-                green_bg=args.green_bg,
-                remove_bg=args.remove_bg,
-                prompt=args.prompt,
-                notes=args.notes,
-            )
-
-            if result["success"]:
-                print(f"  Done!")
-
-        except Exception as e:
-            print(f"  Error: {e}")
-            if "--debug" in sys.argv:
-                import traceback
-                traceback.print_exc()
+        paths.append(path)
+
+    options = dict(
+        asset_type=args.asset_type,
+        theme=args.theme,
+        zone=args.zone,
+        output_name=args.output_name,
+        resize=args.resize,
+        watermark_size=args.watermark_size,
+        skip_watermark=args.skip_watermark,
+        watermark_threshold=args.watermark_threshold,
+        green_bg=args.green_bg,
+        remove_bg=args.remove_bg,
+        prompt=args.prompt,
+        notes=args.notes,
+        force=args.force,
+        use_cache=args.use_cache,
+        png=png,
+        profile_dir=args.profile,
+        trace_memory=args.trace_memory,
+        band_height=args.band_height,
+        formats=formats,
+        widths=widths,
+    )
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    start = time.perf_counter()
+    if args.inpaint_batch > 1 and args.use_cache and not args.skip_watermark and len(paths) > 1:
+        prefill_watermark_stage(paths, args.watermark_size, args.inpaint_batch, args.watermark_threshold)
+    results = ingest_batch(paths, options, jobs=jobs, warm_up=bool(args.warm_up))
+    compact_all_manifests()
+    if args.use_cache:
+        prune_stage_cache(args.cache_mb)
+    for result in results:
+        log_timings(result, args.timings_log)
+
+    if len(results) > 1:
+        print_batch_summary(results, time.perf_counter() - start, jobs=min(jobs, len(results)),
+                            timings_log=args.timings_log)
+    print_stage_summary(results)
 
 
 if __name__ == "__main__":
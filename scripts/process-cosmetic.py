@@ -1,23 +1,29 @@
 #!/usr/bin/env python3
 """
 Process cosmetic images: remove watermark, remove green background, and resize.
-Usage: python process-cosmetic.py <input.png> [--size 64]
+Usage: python process-cosmetic.py <input.png> [more.png ...] [--size 64]
+
+The LaMa model is loaded once and reused for every input file.
 """
 
 import sys
 import os
 from pathlib import Path
 from PIL import Image
-import numpy as np
 
 # Import watermark removal from existing script
 SCRIPTS_DIR = Path(__file__).parent
 sys.path.insert(0, str(SCRIPTS_DIR))
 
+from image_ops import corner_color, fit_within, remove_color_key
+
 try:
-    from remove_watermark import remove_watermark_lama, HAS_LAMA
+    from remove_watermark import remove_watermark_lama, warm_up_lama, HAS_LAMA
 except ImportError:
     HAS_LAMA = False
+    def warm_up_lama():
+        return False
+
     def remove_watermark_lama(img, size=60):
         print("  Warning: LaMa not available for watermark removal")
         return img
@@ -28,24 +34,11 @@ def remove_green_background(img, tolerance=30):
     Handles both pure #00FF00 and Gemini's lime green (~141, 206, 74).
     Auto-detects background color from corner pixel.
     """
-    # Convert to RGBA if needed
-    if img.mode != 'RGBA':
-        img = img.convert('RGBA')
-
-    data = np.array(img)
-
     # Sample corner to detect actual background color
-    bg_color = data[5, 5, :3]
+    bg_color = corner_color(img)
     print(f"  Detected background color: RGB({bg_color[0]}, {bg_color[1]}, {bg_color[2]})")
 
-    # Create mask for pixels close to background color
-    diff = np.abs(data[:, :, :3].astype(int) - bg_color.astype(int))
-    bg_mask = np.all(diff < tolerance, axis=2)
-
-    # Set background pixels to transparent
-    data[bg_mask] = [0, 0, 0, 0]
-
-    return Image.fromarray(data)
+    return remove_color_key(img, bg_color, tolerance)
 
 
 def crop_to_content(img):
@@ -57,21 +50,6 @@ def crop_to_content(img):
     return img
 
 
-def resize_to_fit(img, max_size):
-    """Resize image to fit within max_size while maintaining aspect ratio."""
-    width, height = img.size
-
-    # Calculate scale to fit
-    scale = min(max_size / width, max_size / height)
-
-    if scale < 1:
-        new_width = int(width * scale)
-        new_height = int(height * scale)
-        return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-    return img
-
-
 def process_cosmetic(input_path, output_path=None, size=64, skip_watermark=False):
     """Process a cosmetic image."""
     if output_path is None:
@@ -103,7 +81,7 @@ def process_cosmetic(input_path, output_path=None, size=64, skip_watermark=False
     print(f"  Cropped to content: {img.size}")
 
     # Resize to target size
-    img = resize_to_fit(img, size)
+    img = fit_within(img, size)
     print(f"  Resized to: {img.size}")
 
     # Save
@@ -115,16 +93,26 @@ def process_cosmetic(input_path, output_path=None, size=64, skip_watermark=False
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        print("Usage: python process-cosmetic.py <input.png> [--size 64]")
+        print("Usage: python process-cosmetic.py <input.png> [more.png ...] [--size 64]")
         sys.exit(1)
 
-    input_path = sys.argv[1]
     size = 64
-
-    # Parse --size argument
-    if '--size' in sys.argv:
-        idx = sys.argv.index('--size')
-        if idx + 1 < len(sys.argv):
-            size = int(sys.argv[idx + 1])
-
-    process_cosmetic(input_path, size=size)
+    input_paths = []
+
+    # Parse --size argument; everything else is an input file
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        if args[i] == '--size' and i + 1 < len(args):
+            size = int(args[i + 1])
+            i += 2
+            continue
+        input_paths.append(args[i])
+        i += 1
+
+    # Load LaMa once up front; every file below reuses the same model
+    if len(input_paths) > 1:
+        warm_up_lama()
+
+    for input_path in input_paths:
+        process_cosmetic(input_path, size=size)
@@ -9,31 +9,118 @@ Usage:
 Options:
     --size 60      Size of corner area to fix (default: 60px)
     --method inpaint  Method: 'inpaint' (content-aware fill), 'crop', 'fill', 'clone'
+    --full-frame   Inpaint the whole image instead of a crop around the watermark
+    --check IMAGE...  Regression check against known-watermarked originals
 """
 
+import importlib.util
+import json
+import os
+import shutil
 import sys
+import threading
+from functools import lru_cache
 from pathlib import Path
 
 try:
-    from PIL import Image, ImageFilter, ImageDraw
+    from PIL import Image, ImageChops, ImageFilter, ImageDraw
 except ImportError:
     print("PIL not found. Install with: pip install Pillow")
     sys.exit(1)
 
+# Optional backends are only located here, not imported: cv2 costs ~100ms
+# and simple_lama_inpainting pulls in torch (seconds), which light runs
+# (--help, --skip-watermark, green-bg only) never need. Functions import
+# them on first use.
+
 # Optional: OpenCV for better inpainting
-try:
-    import cv2
-    import numpy as np
-    HAS_OPENCV = True
-except ImportError:
-    HAS_OPENCV = False
+HAS_OPENCV = (importlib.util.find_spec("cv2") is not None
+              and importlib.util.find_spec("numpy") is not None)
+
+# numpy alone is enough for the array-based fill fallback
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
 
 # Optional: LaMa for best quality inpainting
-try:
-    from simple_lama_inpainting import SimpleLama
-    HAS_LAMA = True
-except ImportError:
-    HAS_LAMA = False
+HAS_LAMA = importlib.util.find_spec("simple_lama_inpainting") is not None
+
+# Corner area searched by detect_gemini_watermark
+WATERMARK_SEARCH_SIZE = 100
+
+# Star template matching: a synthetic 4-point star, the superellipse
+# |x|^p + |y|^p <= radius^p (p = 0.6 matches Gemini's concave-sided
+# sparkle), is matched against the corner with normalized cross-correlation
+# at each candidate radius.
+STAR_SHAPE_EXPONENT = 0.6
+STAR_TEMPLATE_RADII = tuple(range(8, 36, 2))
+STAR_MATCH_THRESHOLD = 0.6
+
+# Where Gemini puts the star: centered 57px in from the bottom-right corner,
+# radius ~28px (same at 1024x1024, 1184x912 and 1584x672)
+GEMINI_STAR_OFFSET = 57
+GEMINI_STAR_RADIUS = 28
+
+# Presence check: the best star score at the expected position(s). Cleaned
+# and non-Gemini images score below ~0.15, watermarked ones (even the faint
+# star over a fake transparency checkerboard) above ~0.25; below the
+# threshold inpainting is skipped.
+WATERMARK_PRESENCE_THRESHOLD = 0.2
+# The star is a translucent white overlay, invisible on pure white. Pixels
+# at or above this level are left out of the masked score, so the edges of
+# a white/grey checkerboard don't swamp the correlation.
+STAR_WHITE_LEVEL = 250
+# Extra pixels around the matched star tips included in the mask
+STAR_MASK_PAD = 2
+# --check: share of the star's pixels that must change (by at least
+# CHECK_PIXEL_DELTA levels in some channel) after removal
+CHECK_MIN_CHANGED = 0.5
+CHECK_PIXEL_DELTA = 2
+
+# Gemini puts the star at a fixed offset for a given output resolution, so
+# confirmed positions are remembered per (width, height) and only verified
+# (one small correlation) on later images of that size.
+WATERMARK_POSITIONS_FILE = Path(__file__).parent.parent / ".cache/asset-pipeline/watermark-positions.json"
+
+# Context kept around the watermark when inpainting a crop instead of the
+# full frame. LaMa needs surrounding texture to fill from; TELEA only looks
+# inpaintRadius (5px) out.
+LAMA_ROI_CONTEXT = 64
+INPAINT_ROI_PAD = 16
+
+# Fixed corner tile used for batched inpainting. The star sits within ~60px
+# of the corner, so this holds the mask plus LAMA_ROI_CONTEXT for LaMa, and
+# a multiple of 8 means no per-tile padding.
+LAMA_BATCH_TILE = 192
+
+# LaMa weights take seconds to load, so keep one model per process (or per
+# pool worker) and reuse it for every image instead of rebuilding it per call.
+_lama_model = None
+_lama_lock = threading.Lock()
+
+_watermark_positions = None
+_watermark_positions_lock = threading.Lock()
+
+
+def get_lama_model():
+    """Return the process-wide LaMa model, loading it on first use."""
+    global _lama_model
+    if _lama_model is None:
+        with _lama_lock:
+            if _lama_model is None:
+                from simple_lama_inpainting import SimpleLama
+                print("Loading LaMa model (first run downloads ~200MB)...")
+                _lama_model = SimpleLama()
+    return _lama_model
+
+
+def warm_up_lama() -> bool:
+    """Load the LaMa model eagerly so the first image doesn't pay for it.
+
+    Returns False if LaMa isn't installed.
+    """
+    if not HAS_LAMA:
+        return False
+    get_lama_model()
+    return True
 
 
 def remove_watermark_crop(img: Image.Image, margin: int = 40) -> Image.Image:
@@ -45,8 +132,11 @@ def remove_watermark_crop(img: Image.Image, margin: int = 40) -> Image.Image:
     return cropped.resize((width, height), Image.Resampling.LANCZOS)
 
 
-def remove_watermark_fill(img: Image.Image, size: int = 40) -> Image.Image:
-    """Remove watermark by filling corner with nearby pixels."""
+def remove_watermark_fill_reference(img: Image.Image, size: int = 40) -> Image.Image:
+    """Remove watermark by filling corner with nearby pixels.
+
+    Reference implementation: getpixel/putpixel per corner pixel.
+    """
     width, height = img.size
     img = img.copy()
 
@@ -95,8 +185,70 @@ def remove_watermark_fill(img: Image.Image, size: int = 40) -> Image.Image:
     return img
 
 
-def remove_watermark_clone(img: Image.Image, size: int = 40) -> Image.Image:
-    """Remove watermark by cloning from adjacent area with blending."""
+@lru_cache(maxsize=16)
+def _fill_blend_weights(size: int, mode: str):
+    """(blend, inverse) weights used by remove_watermark_fill, one plane per band.
+
+    Blend runs from 0 at the corner boundary to 1 toward the corner. The
+    alpha plane of RGBA is all blend, so it takes the fill's 255. Cached by
+    (size, mode); the arrays are read-only.
+    """
+    import numpy as np
+
+    d = np.arange(size, dtype=np.float64)
+    plane = np.minimum(1.0, (d[:, None] + d[None, :]) / (size * 1.5))
+    blend = np.repeat(plane[:, :, None], len(mode), axis=2)
+    if mode == "RGBA":
+        blend[:, :, 3] = 1.0
+    inverse = 1 - blend
+    blend.setflags(write=False)
+    inverse.setflags(write=False)
+    return blend, inverse
+
+
+def remove_watermark_fill(img: Image.Image, size: int = 40) -> Image.Image:
+    """Remove watermark by filling corner with nearby pixels.
+
+    Same output as remove_watermark_fill_reference(): the blend is done on
+    the corner as a float64 array with the same operation order, then
+    truncated like int(). Falls back to the reference without numpy or for
+    modes/sizes the array path doesn't cover.
+    """
+    width, height = img.size
+    if not HAS_NUMPY or img.mode not in ("RGB", "RGBA") or size > min(width, height) or size <= 0:
+        return remove_watermark_fill_reference(img, size)
+
+    import numpy as np
+
+    img = img.copy()
+
+    # Average color from the area just above/left of the watermark
+    sample = np.asarray(img.crop((
+        width - size - 20,
+        height - size - 20,
+        width - size,
+        height - size
+    )))
+    count = sample.shape[0] * sample.shape[1]
+    avg_color = [int(sample[:, :, c].sum(dtype=np.int64)) // count for c in range(3)]
+    if img.mode == "RGBA":
+        # putpixel with an RGB tuple leaves the pixel opaque
+        avg_color.append(255)
+
+    box = (width - size, height - size, width, height)
+    blend, inverse = _fill_blend_weights(size, img.mode)
+    corner = np.asarray(img.crop(box))
+    blended = corner * inverse + np.array(avg_color, dtype=np.float64) * blend
+
+    img.paste(Image.fromarray(blended.astype(np.uint8), img.mode), box)
+    return img
+
+
+def remove_watermark_clone_reference(img: Image.Image, size: int = 40) -> Image.Image:
+    """Remove watermark by cloning from adjacent area with blending.
+
+    Reference implementation: builds the gradient mask with putpixel.
+    """
     width, height = img.size
     img = img.copy()
 
@@ -123,11 +275,45 @@ def remove_watermark_clone(img: Image.Image, size: int = 40) -> Image.Image:
     return img
 
 
+@lru_cache(maxsize=16)
+def _clone_gradient_mask(size: int) -> Image.Image:
+    """Left-to-right sqrt falloff mask used by remove_watermark_clone.
+
+    Every row is the same, so one row is computed and repeated. Cached by
+    size; callers only pass it to paste(), which doesn't modify it.
+    """
+    row = bytes(int(255 * (1 - x / size) ** 0.5) for x in range(size))
+    return Image.frombytes('L', (size, size), row * size)
+
+
+def remove_watermark_clone(img: Image.Image, size: int = 40) -> Image.Image:
+    """Remove watermark by cloning from adjacent area with blending."""
+    width, height = img.size
+    img = img.copy()
+
+    # Clone from area to the LEFT of the watermark (same y level for texture match)
+    # This gives better texture continuity than copying from above
+    source_region = img.crop((
+        width - size * 3,       # Further left
+        height - size,          # Same y level as watermark
+        width - size * 2,       # End before watermark area
+        height
+    ))
+
+    # Paste with a gradient mask for smooth blending
+    img.paste(source_region, (width - size, height - size), _clone_gradient_mask(size))
+
+    return img
+
+
 def detect_gemini_watermark(img_cv, search_region_size=100):
     """Detect the Gemini 4-pointed star watermark in the bottom-right corner.
 
     Returns the center (x, y) and approximate size of the watermark, or None if not found.
     """
+    import cv2
+    import numpy as np
+
     height, width = img_cv.shape[:2]
 
     # Only search in the bottom-right corner region
@@ -184,100 +370,507 @@ def detect_gemini_watermark(img_cv, search_region_size=100):
     return best_match
 
 
-def remove_watermark_lama(img: Image.Image, size: int = 60) -> Image.Image:
+@lru_cache(maxsize=None)
+def _star_template(radius: int):
+    """Grayscale star on a dark margin, as a uint8 array.
+
+    Rasterized at 4x and box-downsampled so the edges are antialiased like
+    the real watermark. The star's center is the array's center pixel.
+    """
+    import numpy as np
+
+    scale = 4
+    margin = max(3, radius // 4)
+    side = 2 * (radius + margin) + 1
+    coords = (np.arange(side * scale) + 0.5) / scale - side / 2
+    x = np.abs(coords[None, :] / radius) ** STAR_SHAPE_EXPONENT
+    y = np.abs(coords[:, None] / radius) ** STAR_SHAPE_EXPONENT
+    big = Image.fromarray(((x + y <= 1) * 255).astype(np.uint8))
+    return np.asarray(big.resize((side, side), Image.Resampling.BOX))
+
+
+def _match_star(gray, radii=STAR_TEMPLATE_RADII):
+    """Best star match in a grayscale array: (center_x, center_y, radius, score).
+
+    Searched coarse-to-fine: every radius is tried on a half-resolution
+    copy, then the best candidate is refined at full resolution over the
+    neighbouring radii, in a few-pixel window around its position.
+    """
+    import cv2
+
+    small = cv2.resize(gray, (gray.shape[1] // 2, gray.shape[0] // 2), interpolation=cv2.INTER_AREA)
+    coarse = None
+    for radius in radii:
+        template = _star_template(radius // 2)
+        if template.shape[0] > small.shape[0] or template.shape[1] > small.shape[1]:
+            break
+        scores = cv2.matchTemplate(small, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (x, y) = cv2.minMaxLoc(scores)
+        if coarse is None or score > coarse[3]:
+            half = template.shape[0] // 2
+            coarse = (2 * (x + half), 2 * (y + half), radius, score)
+    if coarse is None:
+        return None
+
+    center_x, center_y, coarse_radius, _ = coarse
+    best = None
+    for radius in range(coarse_radius - 2, coarse_radius + 3):
+        if radius < 2:
+            continue
+        found = _star_score_at(gray, center_x, center_y, radius, slack=3)
+        if found and (best is None or found[2] > best[3]):
+            best = (found[0], found[1], radius, found[2])
+    return best
+
+
+def _masked_star_scores(window, template):
+    """TM_CCOEFF_NORMED over window, leaving out near-white window pixels.
+
+    Returns a score array like cv2.matchTemplate's; placements where most
+    pixels are white score -1.
+    """
+    import numpy as np
+
+    side = template.shape[0]
+    views = np.lib.stride_tricks.sliding_window_view(window.astype(np.float64), (side, side))
+    valid = views < STAR_WHITE_LEVEL
+    t = template.astype(np.float64)
+
+    n = valid.sum(axis=(2, 3))
+    img_sum = np.where(valid, views, 0).sum(axis=(2, 3))
+    img_sq = np.where(valid, views * views, 0).sum(axis=(2, 3))
+    t_sum = np.einsum('ijkl,kl->ij', valid, t)
+    t_sq = np.einsum('ijkl,kl->ij', valid, t * t)
+    cross = np.einsum('ijkl,kl->ij', np.where(valid, views, 0), t)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nn = np.maximum(n, 1)
+        cov = cross - img_sum * t_sum / nn
+        var = (img_sq - img_sum ** 2 / nn) * (t_sq - t_sum ** 2 / nn)
+        scores = cov / np.sqrt(var)
+    return np.where((n >= side * side // 4) & (var > 0), scores, -1.0)
+
+
+def _star_score_at(gray, center_x, center_y, radius, slack=2):
+    """Match score for a star of radius within slack px of (center_x, center_y).
+
+    The score is the better of plain normalized cross-correlation and the
+    same with near-white pixels masked out (see STAR_WHITE_LEVEL). The
+    search window is clamped to gray, so a star hugging the edge is still
+    scored. Returns (center_x, center_y, score), or None if the template
+    doesn't fit there.
+    """
+    import cv2
+    import numpy as np
+
+    template = _star_template(radius)
+    side = template.shape[0]
+    half = side // 2
+    left = max(0, center_x - half - slack)
+    top = max(0, center_y - half - slack)
+    right = min(gray.shape[1], center_x + half + slack + 1)
+    bottom = min(gray.shape[0], center_y + half + slack + 1)
+    if right - left < side or bottom - top < side:
+        return None
+
+    window = gray[top:bottom, left:right]
+    scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+    if (window >= STAR_WHITE_LEVEL).any():
+        scores = np.maximum(scores, _masked_star_scores(window, template))
+    y, x = np.unravel_index(np.argmax(scores), scores.shape)
+    return left + int(x) + half, top + int(y) + half, float(scores[y, x])
+
+
+def _load_watermark_positions() -> dict:
+    """Per-resolution watermark positions, read from disk once per process."""
+    global _watermark_positions
+    if _watermark_positions is None:
+        with _watermark_positions_lock:
+            if _watermark_positions is None:
+                try:
+                    _watermark_positions = json.loads(WATERMARK_POSITIONS_FILE.read_text())
+                except (OSError, ValueError):
+                    _watermark_positions = {}
+    return _watermark_positions
+
+
+def _remember_watermark_position(width, height, center_x, center_y, radius):
+    """Record a confirmed position for this resolution (merged, atomic write)."""
+    positions = _load_watermark_positions()
+    key = f"{width}x{height}"
+    entry = {"x": center_x, "y": center_y, "radius": radius}
+    if positions.get(key) == entry:
+        return
+
+    with _watermark_positions_lock:
+        positions[key] = entry
+        # Merge with entries other processes wrote since we loaded
+        try:
+            on_disk = json.loads(WATERMARK_POSITIONS_FILE.read_text())
+        except (OSError, ValueError):
+            on_disk = {}
+        on_disk.update(positions)
+        try:
+            WATERMARK_POSITIONS_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = WATERMARK_POSITIONS_FILE.with_name(f"{WATERMARK_POSITIONS_FILE.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(on_disk, indent=2, sort_keys=True) + "\n")
+            os.replace(tmp_path, WATERMARK_POSITIONS_FILE)
+        except OSError:
+            pass  # cache only
+
+
+def _star_mask_size(radius: int) -> int:
+    return 2 * (radius + STAR_MASK_PAD)
+
+
+def find_watermark(img: Image.Image, size: int = 60):
+    """Find the watermark, returning (center_x, center_y, mask_size, score).
+
+    With OpenCV, the corner search region is checked in order:
+    1. the position cached for this resolution, then Gemini's usual spot,
+       each verified with one small template correlation;
+    2. star template matching over the corner (the result is cached);
+    3. the best of the step 1 positions, if it scored at least
+       WATERMARK_PRESENCE_THRESHOLD (a faint star, not cached);
+    4. the contour detector (detect_gemini_watermark);
+    5. the best step 1 position anyway, with its sub-threshold score.
+    Template matches give a mask sized to the matched star; otherwise it
+    assumes the star is centered in the bottom-right size x size corner.
+
+    score is the star match at the returned position, for
+    watermark_present(), so the presence decision and the mask always come
+    from the same place: the template match that found it, or for the
+    contour fallback the best template around the detected center (-1 if
+    no template fits there); None without OpenCV. Detection prints what it
+    found, so callers that also remove the watermark should pass this
+    result on rather than detecting again.
+    """
+    width, height = img.size
+
+    if not HAS_OPENCV:
+        return width - size // 2, height - size // 2, size, None
+
+    import cv2
+    import numpy as np
+
+    left = max(0, width - WATERMARK_SEARCH_SIZE)
+    top = max(0, height - WATERMARK_SEARCH_SIZE)
+    corner = img.crop((left, top, width, height)).convert('RGB')
+    gray = np.asarray(corner.convert('L'))
+
+    candidates = []
+    cached = _load_watermark_positions().get(f"{width}x{height}")
+    if cached:
+        candidates.append((cached["x"], cached["y"], cached["radius"], True))
+    default = (width - GEMINI_STAR_OFFSET, height - GEMINI_STAR_OFFSET, GEMINI_STAR_RADIUS)
+    if not cached or default != (cached["x"], cached["y"], cached["radius"]):
+        candidates.append(default + (False,))
+
+    score = -1.0
+    best = None  # best-scoring candidate: (center_x, center_y, radius, score)
+    for center_x, center_y, radius, from_cache in candidates:
+        found = _star_score_at(gray, center_x - left, center_y - top, radius)
+        if not found:
+            continue
+        score = max(score, found[2])
+        if best is None or found[2] > best[3]:
+            best = (found[0] + left, found[1] + top, radius, found[2])
+        if found[2] >= STAR_MATCH_THRESHOLD:
+            center_x, center_y = found[0] + left, found[1] + top
+            if from_cache:
+                print(f"Watermark at cached position ({center_x}, {center_y}), radius {radius}px")
+            else:
+                print(f"Matched watermark at ({center_x}, {center_y}), radius {radius}px (score {found[2]:.2f})")
+                _remember_watermark_position(width, height, center_x, center_y, radius)
+            return center_x, center_y, _star_mask_size(radius), found[2]
+
+    match = _match_star(gray)
+    if match and match[3] >= STAR_MATCH_THRESHOLD:
+        center_x, center_y, radius, match_score = match
+        center_x += left
+        center_y += top
+        print(f"Matched watermark at ({center_x}, {center_y}), radius {radius}px (score {match_score:.2f})")
+        _remember_watermark_position(width, height, center_x, center_y, radius)
+        return center_x, center_y, _star_mask_size(radius), match_score
+
+    if best and best[3] >= WATERMARK_PRESENCE_THRESHOLD:
+        # A faint star where Gemini puts it (e.g. over sky or a checkerboard):
+        # mask it where it was scored, not at a guessed corner
+        center_x, center_y, radius, best_score = best
+        print(f"Faint watermark at ({center_x}, {center_y}), radius {radius}px (score {best_score:.2f})")
+        return center_x, center_y, _star_mask_size(radius), best_score
+
+    corner_cv = cv2.cvtColor(np.array(corner), cv2.COLOR_RGB2BGR)
+    detection = detect_gemini_watermark(corner_cv, WATERMARK_SEARCH_SIZE)
+
+    if detection:
+        center_x, center_y, detected_size = detection
+        # Score what was actually found, not the expected position
+        scores = [
+            found[2] for radius in STAR_TEMPLATE_RADII if abs(radius - detected_size // 2) <= 4
+            for found in [_star_score_at(gray, center_x, center_y, radius, slack=3)] if found
+        ]
+        # No template fits there: unscored, so only threshold <= 0 inpaints it
+        score = max(scores, default=-1.0)
+        center_x += left
+        center_y += top
+        print(f"Detected watermark at ({center_x}, {center_y}), size ~{detected_size}px (score {score:.2f})")
+        # Use detected location with some padding
+        return center_x, center_y, max(size, detected_size + 20), score
+
+    if best:
+        # Nothing convincing: report the expected position with its own
+        # (sub-threshold) score, so presence and mask agree
+        center_x, center_y, radius, best_score = best
+        print(f"No watermark matched, best guess ({center_x}, {center_y}) (score {best_score:.2f})")
+        return center_x, center_y, _star_mask_size(radius), best_score
+
+    print("Auto-detection failed, using corner position...")
+    return width - size // 2, height - size // 2, size, -1.0
+
+
+def locate_watermark(img: Image.Image, size: int = 60):
+    """Find the watermark, returning (center_x, center_y, mask_size). See find_watermark()."""
+    return find_watermark(img, size)[:3]
+
+
+def watermark_present(img: Image.Image, threshold: float = WATERMARK_PRESENCE_THRESHOLD, found=None):
+    """Check for the Gemini star before paying for inpainting.
+
+    Returns (present, score). Without OpenCV the score is None and the
+    watermark is assumed present, as is everything with threshold <= 0.
+    found is a find_watermark() result to reuse instead of detecting again.
+    """
+    score = (found or find_watermark(img))[3]
+    if score is None or threshold <= 0:
+        return True, score
+    return score >= threshold, score
+
+
+def _ellipse_mask(tile_size, center_x, center_y, half_size) -> Image.Image:
+    """L-mode mask with a filled circle around the watermark."""
+    mask = Image.new('L', tile_size, 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse([
+        (center_x - half_size, center_y - half_size),
+        (center_x + half_size, center_y + half_size)
+    ], fill=255)
+    return mask
+
+
+def _roi_box(width, height, center_x, center_y, half_size, context, multiple=8):
+    """Padded box around the watermark, clamped to the image.
+
+    The box is grown toward the top-left to a multiple of 8 where possible,
+    since LaMa pads its input to that anyway.
+    """
+    left = max(0, center_x - half_size - context)
+    top = max(0, center_y - half_size - context)
+    right = min(width, center_x + half_size + context + 1)
+    bottom = min(height, center_y + half_size + context + 1)
+
+    left = max(0, left - (-(right - left) % multiple))
+    top = max(0, top - (-(bottom - top) % multiple))
+    return left, top, right, bottom
+
+
+def remove_watermark_lama(img: Image.Image, size: int = 60, roi: bool = True, location=None) -> Image.Image:
     """Remove watermark using LaMa inpainting (best quality).
 
     LaMa (Large Mask Inpainting) provides significantly better results than
     OpenCV inpainting, especially for textured areas like wood grain.
 
-    Automatically detects the Gemini star watermark location.
+    Automatically detects the Gemini star watermark location. With roi (the
+    default) only a padded tile around the watermark is inpainted and then
+    feather-blended back, instead of running the model on the full frame -
+    a ~200x200 tile instead of a 1024x1024+ image.
+
+    location is a (center_x, center_y, mask_size) already found by
+    locate_watermark/find_watermark, to skip detecting it again.
     """
     if not HAS_LAMA:
         print("LaMa not found. Install with: pip install simple-lama-inpainting")
         print("Falling back to OpenCV inpainting...")
-        return remove_watermark_inpaint(img, size)
+        return remove_watermark_inpaint(img, size, roi=roi, location=location)
 
     width, height = img.size
+    center_x, center_y, mask_size = location or locate_watermark(img, size)
 
-    # Try to detect the watermark location
-    if HAS_OPENCV:
-        img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-        detection = detect_gemini_watermark(img_cv)
+    # Circle around the watermark (better than rectangle for star shape)
+    half_size = mask_size // 2 + 5
 
-        if detection:
-            center_x, center_y, detected_size = detection
-            print(f"Detected watermark at ({center_x}, {center_y}), size ~{detected_size}px")
-            # Use detected location with some padding
-            mask_size = max(size, detected_size + 20)
-        else:
-            print("Auto-detection failed, using corner position...")
-            center_x = width - size // 2
-            center_y = height - size // 2
-            mask_size = size
-    else:
-        center_x = width - size // 2
-        center_y = height - size // 2
-        mask_size = size
+    # Run inpainting with the shared (already loaded) model
+    simple_lama = get_lama_model()
 
-    # Create mask centered on the detected/assumed watermark location
-    mask = Image.new('L', (width, height), 0)
-    from PIL import ImageDraw
-    draw = ImageDraw.Draw(mask)
+    if not roi:
+        mask = _ellipse_mask((width, height), center_x, center_y, half_size)
+        return simple_lama(img, mask)
 
-    # Draw a circle/ellipse around the watermark (better than rectangle for star shape)
-    half_size = mask_size // 2 + 5
-    draw.ellipse([
-        (center_x - half_size, center_y - half_size),
-        (center_x + half_size, center_y + half_size)
-    ], fill=255)
+    box = _roi_box(width, height, center_x, center_y, half_size, LAMA_ROI_CONTEXT)
+    tile = img.crop(box)
+    tile_mask = _ellipse_mask(tile.size, center_x - box[0], center_y - box[1], half_size)
+
+    # LaMa pads to a multiple of 8 on the bottom/right; drop the padding
+    inpainted = simple_lama(tile, tile_mask).crop((0, 0, tile.width, tile.height))
+
+    return _blend_tile(img, inpainted, tile_mask, box)
 
-    # Initialize LaMa model
-    print("Loading LaMa model (first run downloads ~200MB)...")
-    simple_lama = SimpleLama()
 
-    # Run inpainting
-    result = simple_lama(img, mask)
+def _blend_tile(img: Image.Image, tile: Image.Image, tile_mask: Image.Image, box) -> Image.Image:
+    """Paste an inpainted tile back with a feathered edge around the mask.
 
+    The mask is grown by 4px and blurred so the model's slight drift outside
+    the mask fades out; the blur still reaches back inside, so the weight is
+    clamped to 255 over the mask itself and every masked pixel is fully
+    replaced.
+    """
+    feather = tile_mask.filter(ImageFilter.MaxFilter(9)).filter(ImageFilter.GaussianBlur(2))
+    feather = ImageChops.lighter(feather, tile_mask)
+    result = img.copy()
+    result.paste(tile.convert(img.mode), box[:2], feather)
     return result
 
 
-def remove_watermark_inpaint(img: Image.Image, size: int = 60) -> Image.Image:
+def remove_watermark_lama_batch(images: list, size: int = 60, batch_size: int = 8, locations: list = None) -> list:
+    """Remove watermarks from many images, inpainting their corners together.
+
+    Cuts a fixed LAMA_BATCH_TILE corner tile from each image, stacks up to
+    batch_size tiles into one tensor and runs a single LaMa forward pass per
+    stack, then feather-blends each result back. Much better per-image
+    throughput on CPU than one call per image. Images whose watermark plus
+    LAMA_ROI_CONTEXT doesn't fit in the corner tile (or that are smaller
+    than it) go through remove_watermark_lama one at a time, so every
+    inpaint sees the same context as the single-image path.
+
+    locations optionally gives each image's (center_x, center_y, mask_size),
+    as from locate_watermark, so they aren't detected again.
+
+    Returns the cleaned images in input order.
+    """
+    locations = locations or [None] * len(images)
+    if not HAS_LAMA:
+        return [remove_watermark_lama(img, size, location=loc) for img, loc in zip(images, locations)]
+
+    import numpy as np
+    import torch
+
+    results = list(images)
+    tile = LAMA_BATCH_TILE
+    jobs = []  # (index, box, tile image, tile mask)
+
+    for i, (img, location) in enumerate(zip(images, locations)):
+        width, height = img.size
+        center_x, center_y, mask_size = location or locate_watermark(img, size)
+        half_size = mask_size // 2 + 5
+        box = (width - tile, height - tile, width, height)
+
+        fits = (width >= tile and height >= tile
+                and center_x - half_size - LAMA_ROI_CONTEXT >= box[0]
+                and center_y - half_size - LAMA_ROI_CONTEXT >= box[1])
+        if not fits:
+            results[i] = remove_watermark_lama(img, size, location=(center_x, center_y, mask_size))
+            continue
+
+        tile_mask = _ellipse_mask((tile, tile), center_x - box[0], center_y - box[1], half_size)
+        jobs.append((i, box, img.crop(box).convert('RGB'), tile_mask))
+
+    simple_lama = get_lama_model()
+
+    for start in range(0, len(jobs), batch_size):
+        chunk = jobs[start:start + batch_size]
+        print(f"Inpainting {len(chunk)} watermark tiles in one batch...")
+
+        # Same preprocessing as simple_lama: CHW float in [0, 1], binary mask
+        tiles = np.stack([np.asarray(t, dtype=np.float32) / 255 for _, _, t, _ in chunk])
+        masks = np.stack([(np.asarray(m) > 0).astype(np.float32) for _, _, _, m in chunk])
+        tiles_t = torch.from_numpy(tiles.transpose(0, 3, 1, 2).copy()).to(simple_lama.device)
+        masks_t = torch.from_numpy(masks[:, None]).to(simple_lama.device)
+
+        try:
+            with torch.inference_mode():
+                out = simple_lama.model(tiles_t, masks_t)
+            out = out.permute(0, 2, 3, 1).detach().cpu().numpy()
+            inpainted = [Image.fromarray(np.clip(o * 255, 0, 255).astype(np.uint8)) for o in out]
+        except RuntimeError as e:
+            # Model can't take a batch on this device/build - one tile at a time
+            print(f"Batched inpainting failed ({e}); falling back to per-tile")
+            inpainted = [simple_lama(t, m).crop((0, 0, tile, tile)) for _, _, t, m in chunk]
+
+        for (i, box, _, tile_mask), result_tile in zip(chunk, inpainted):
+            results[i] = _blend_tile(images[i], result_tile, tile_mask, box)
+
+    return results
+
+
+def remove_watermark_inpaint(img: Image.Image, size: int = 60, roi: bool = True, location=None) -> Image.Image:
     """Remove watermark using OpenCV inpainting (content-aware fill).
 
-    Uses a triangular mask in the bottom-right corner to target the Gemini star,
-    which appears within ~40px of the corner.
+    With a location from find_watermark, (center_x, center_y, mask_size),
+    masks the same circle remove_watermark_lama would. Otherwise uses a
+    triangular mask in the bottom-right corner to target the Gemini star,
+    which appears within ~40px of the corner. With roi (the default) only the
+    mask plus a few pixels of context is converted and inpainted; TELEA
+    only samples within inpaintRadius of the mask, so the result is the same.
     """
     if not HAS_OPENCV:
         print("OpenCV not found. Install with: pip install opencv-python")
         print("Falling back to clone method...")
         return remove_watermark_clone(img, size)
 
+    import cv2
+    import numpy as np
+
     width, height = img.size
 
+    if location:
+        center_x, center_y, mask_size = location
+        half_size = mask_size // 2 + 5
+
+    # Region to work on: around the mask, or the whole frame
+    if not roi:
+        left, top, right, bottom = 0, 0, width, height
+    elif location:
+        left, top, right, bottom = _roi_box(width, height, center_x, center_y, half_size, INPAINT_ROI_PAD)
+    else:
+        left = max(0, width - size - INPAINT_ROI_PAD)
+        top = max(0, height - size - INPAINT_ROI_PAD)
+        right, bottom = width, height
+    region = img.crop((left, top, right, bottom)) if roi else img
+
     # Convert PIL to OpenCV format
-    img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+    img_cv = cv2.cvtColor(np.array(region), cv2.COLOR_RGB2BGR)
 
-    # Create mask for the bottom-right corner
-    # Use a triangular shape that covers the corner where the star appears
-    mask = np.zeros((height, width), dtype=np.uint8)
+    if location:
+        # Circle around the located star (region coordinates)
+        mask = np.array(_ellipse_mask(region.size, center_x - left, center_y - top, half_size))
+    else:
+        # Create mask for the bottom-right corner
+        # Use a triangular shape that covers the corner where the star appears
+        mask = np.zeros(img_cv.shape[:2], dtype=np.uint8)
 
-    # Triangle points: bottom-right corner area
-    # The star is typically within 40-50px of the corner
-    corner_size = size
-    pts = np.array([
-        [width, height],                          # bottom-right corner
-        [width - corner_size, height],            # left along bottom
-        [width, height - corner_size],            # up along right edge
-    ], dtype=np.int32)
+        # Triangle points: bottom-right corner area (in region coordinates)
+        # The star is typically within 40-50px of the corner
+        corner_size = size
+        pts = np.array([
+            [width, height],                          # bottom-right corner
+            [width - corner_size, height],            # left along bottom
+            [width, height - corner_size],            # up along right edge
+        ], dtype=np.int32) - np.array([left, top], dtype=np.int32)
 
-    cv2.fillPoly(mask, [pts], 255)
+        cv2.fillPoly(mask, [pts], 255)
 
     # Use TELEA inpainting with moderate radius
     result = cv2.inpaint(img_cv, mask, inpaintRadius=5, flags=cv2.INPAINT_TELEA)
 
     # Convert back to PIL
     result_rgb = cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
-    return Image.fromarray(result_rgb)
+    if not roi:
+        return Image.fromarray(result_rgb)
+
+    # Pixels outside the mask are untouched, so a hard paste is seamless
+    output = img.copy()
+    output.paste(Image.fromarray(result_rgb), (left, top))
+    return output
 
 
 def remove_watermark_debug(img: Image.Image, size: int = 60) -> Image.Image:
@@ -286,6 +879,9 @@ def remove_watermark_debug(img: Image.Image, size: int = 60) -> Image.Image:
         print("OpenCV not found for debug mode")
         return img
 
+    import cv2
+    import numpy as np
+
     width, height = img.size
     img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
 
@@ -307,17 +903,71 @@ def remove_watermark_debug(img: Image.Image, size: int = 60) -> Image.Image:
     return Image.fromarray(result_rgb)
 
 
+def check_removal(paths: list, size: int = 60, threshold: float = WATERMARK_PRESENCE_THRESHOLD) -> int:
+    """Regression check on known-watermarked images; returns the failure count.
+
+    Each image must be detected, and at least CHECK_MIN_CHANGED of the
+    pixels under a star template at the found position must change after
+    removal - a mask placed away from the star leaves most of it untouched.
+    """
+    import numpy as np
+
+    failures = 0
+    for path in map(Path, paths):
+        img = Image.open(path).convert('RGB')
+        found = find_watermark(img, size)
+        present, score = watermark_present(img, threshold, found)
+        problem = None
+        if not present:
+            problem = f"not detected (score {score:.2f})"
+        else:
+            center_x, center_y, mask_size = found[:3]
+            radius = min(STAR_TEMPLATE_RADII, key=lambda r: abs(r - (mask_size // 2 - STAR_MASK_PAD)))
+            if HAS_LAMA:
+                result = remove_watermark_lama(img, size, location=found[:3])
+            else:
+                result = remove_watermark_inpaint(img, size, location=found[:3])
+
+            star = _star_template(radius) > 128
+            half = star.shape[0] // 2
+            box = (center_x - half, center_y - half, center_x + half + 1, center_y + half + 1)
+            before = np.asarray(img.crop(box), dtype=np.int16)
+            after = np.asarray(result.crop(box), dtype=np.int16)
+            changed = float((np.abs(after - before).max(axis=2)[star] >= CHECK_PIXEL_DELTA).mean())
+            if changed < CHECK_MIN_CHANGED:
+                problem = f"star mostly untouched ({changed:.0%} of its pixels changed)"
+        failures += problem is not None
+        detail = problem or f"score {score:.2f}, {changed:.0%} of the star changed"
+        print(f"  {'FAIL' if problem else 'OK  '}  {path.name:<40} {detail}")
+    return failures
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='Remove Gemini watermark from images')
-    parser.add_argument('input', help='Input image path')
+    parser.add_argument('input', nargs='?', help='Input image path')
     parser.add_argument('output', nargs='?', help='Output image path (default: overwrite input)')
     parser.add_argument('--size', type=int, default=60, help='Corner size to fix (default: 60)')
     parser.add_argument('--method', choices=['lama', 'inpaint', 'crop', 'fill', 'clone', 'debug'], default='lama',
                         help='Removal method (default: lama)')
+    parser.add_argument('--full-frame', dest='roi', action='store_false',
+                        help='lama/inpaint: process the whole image instead of a crop around the watermark')
+    parser.add_argument('--threshold', type=float, default=WATERMARK_PRESENCE_THRESHOLD,
+                        help='lama/inpaint: leave the image alone if the star scores below this '
+                             f'(0 = always inpaint, default: {WATERMARK_PRESENCE_THRESHOLD})')
+    parser.add_argument('--check', nargs='+', metavar='IMAGE',
+                        help='Regression check: these known-watermarked images must be detected and '
+                             'their star removed (e.g. public/assets/themes/_originals/*/*/*.png)')
 
     args = parser.parse_args()
 
+    if args.check:
+        if check_removal(args.check, args.size, args.threshold):
+            sys.exit(1)
+        return
+    if not args.input:
+        parser.error("an input image (or --check) is required")
+
     input_path = Path(args.input)
     output_path = Path(args.output) if args.output else input_path
 
@@ -332,12 +982,22 @@ def main():
     if img.mode != 'RGB':
         img = img.convert('RGB')
 
+    found = None
+    if args.method in ('lama', 'inpaint'):
+        found = find_watermark(img, args.size)
+        present, score = watermark_present(img, args.threshold, found)
+        if not present:
+            print(f"No watermark found (score {score:.2f} < {args.threshold}), nothing to do.")
+            if output_path != input_path:
+                shutil.copyfile(input_path, output_path)
+            return
+
     print(f"Removing watermark using '{args.method}' method (size: {args.size}px)...")
 
     if args.method == 'lama':
-        result = remove_watermark_lama(img, args.size)
+        result = remove_watermark_lama(img, args.size, roi=args.roi, location=found[:3])
     elif args.method == 'inpaint':
-        result = remove_watermark_inpaint(img, args.size)
+        result = remove_watermark_inpaint(img, args.size, roi=args.roi, location=found[:3])
     elif args.method == 'crop':
         result = remove_watermark_crop(img, args.size)
     elif args.method == 'fill':